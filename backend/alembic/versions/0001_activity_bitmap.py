@@ -0,0 +1,55 @@
+"""Per-user activity bitmap
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS activity_epoch date")
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS activity_bitmap bytea NOT NULL DEFAULT ''::bytea")
+    op.execute("""
+        UPDATE users SET activity_epoch = COALESCE(LEAST(
+            created_at::date,
+            (SELECT min(logs.date) FROM logs WHERE logs.user_id = users.id)
+        ), current_date)
+        WHERE activity_epoch IS NULL
+    """)
+    op.execute("ALTER TABLE users ALTER COLUMN activity_epoch SET DEFAULT current_date")
+    op.execute("ALTER TABLE users ALTER COLUMN activity_epoch SET NOT NULL")
+
+    # Backfill bitmaps from existing logs (bit n = activity_epoch + n days)
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("""
+        SELECT users.id, users.activity_epoch, array_agg(DISTINCT logs.date)
+        FROM users JOIN logs ON logs.user_id = users.id
+        WHERE users.activity_bitmap = ''::bytea
+        GROUP BY users.id, users.activity_epoch
+    """)).all()
+
+    updates = []
+    for user_id, epoch, days in rows:
+        bits = 0
+        for day in days:
+            bits |= 1 << (day - epoch).days
+        updates.append({"id": user_id, "bitmap": bits.to_bytes((bits.bit_length() + 7) // 8, "little")})
+
+    for start in range(0, len(updates), 1000):
+        conn.execute(
+            sa.text("UPDATE users SET activity_bitmap = :bitmap WHERE id = :id"),
+            updates[start:start + 1000]
+        )
+
+
+def downgrade():
+    op.execute("ALTER TABLE users DROP COLUMN IF EXISTS activity_bitmap")
+    op.execute("ALTER TABLE users DROP COLUMN IF EXISTS activity_epoch")
@@ -0,0 +1,52 @@
+"""Daily activity rollup
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS daily_activity (
+            user_id uuid NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            date date NOT NULL,
+            points integer NOT NULL DEFAULT 0,
+            log_count integer NOT NULL DEFAULT 0,
+            seed_count integer NOT NULL DEFAULT 0,
+            sapling_count integer NOT NULL DEFAULT 0,
+            oak_count integer NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, date)
+        )
+    """)
+
+    # Rebuild every row from logs so the rollup is exact even if the app
+    # started writing to the table before this ran
+    op.execute("""
+        INSERT INTO daily_activity (user_id, date, points, log_count, seed_count, sapling_count, oak_count)
+        SELECT user_id, date,
+               sum(points_earned),
+               count(*),
+               count(*) FILTER (WHERE effort_level = 'seed'),
+               count(*) FILTER (WHERE effort_level = 'sapling'),
+               count(*) FILTER (WHERE effort_level = 'oak')
+        FROM logs
+        GROUP BY user_id, date
+        ON CONFLICT (user_id, date) DO UPDATE SET
+            points = EXCLUDED.points,
+            log_count = EXCLUDED.log_count,
+            seed_count = EXCLUDED.seed_count,
+            sapling_count = EXCLUDED.sapling_count,
+            oak_count = EXCLUDED.oak_count
+    """)
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS daily_activity")
@@ -0,0 +1,59 @@
+"""Composite and partial indexes for the hot route queries
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+NEW_INDEXES = [
+    # /logs/today and date-range exports
+    "ix_logs_user_id_date_logged_at ON logs (user_id, date, logged_at DESC)",
+    # milestone award check / ON CONFLICT target
+    "uq_milestones_user_id_badge_name ON milestones (user_id, badge_name)",
+    # GET /share
+    "ix_shared_forests_user_id_created_at ON shared_forests (user_id, created_at DESC)",
+    # daily streak leaderboard
+    "ix_streaks_daily_current_count ON streaks (current_count DESC) WHERE streak_type = 'daily'",
+]
+
+# Single-column indexes now covered by the leading column of a composite
+REDUNDANT_INDEXES = {
+    "ix_logs_user_id": "logs (user_id)",
+    "ix_logs_date": "logs (date)",
+    "ix_streaks_user_id": "streaks (user_id)",
+    "ix_milestones_user_id": "milestones (user_id)",
+}
+
+
+def upgrade():
+    # Keep the earliest copy of any badge awarded twice before it was unique
+    op.execute("""
+        DELETE FROM milestones m
+        USING milestones older
+        WHERE m.user_id = older.user_id
+          AND m.badge_name = older.badge_name
+          AND (m.earned_at, m.id) > (older.earned_at, older.id)
+    """)
+
+    # CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for index in NEW_INDEXES:
+            unique = "UNIQUE " if index.startswith("uq_") else ""
+            op.execute(f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {index}")
+        for name in REDUNDANT_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, definition in REDUNDANT_INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+        for index in NEW_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index.split()[0]}")
@@ -0,0 +1,50 @@
+"""Weekly and monthly leaderboard points
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE users
+            ADD COLUMN IF NOT EXISTS week_start date,
+            ADD COLUMN IF NOT EXISTS week_points integer DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS month_start date,
+            ADD COLUMN IF NOT EXISTS month_points integer DEFAULT 0
+    """)
+
+    # Seed the current week and month from the rollup
+    op.execute("""
+        UPDATE users SET
+            week_start = date_trunc('week', current_date)::date,
+            week_points = coalesce((
+                SELECT sum(points) FROM daily_activity
+                WHERE daily_activity.user_id = users.id
+                  AND daily_activity.date >= date_trunc('week', current_date)::date
+            ), 0),
+            month_start = date_trunc('month', current_date)::date,
+            month_points = coalesce((
+                SELECT sum(points) FROM daily_activity
+                WHERE daily_activity.user_id = users.id
+                  AND daily_activity.date >= date_trunc('month', current_date)::date
+            ), 0)
+    """)
+
+
+def downgrade():
+    op.execute("""
+        ALTER TABLE users
+            DROP COLUMN IF EXISTS week_start,
+            DROP COLUMN IF EXISTS week_points,
+            DROP COLUMN IF EXISTS month_start,
+            DROP COLUMN IF EXISTS month_points
+    """)
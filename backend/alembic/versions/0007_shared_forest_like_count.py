@@ -0,0 +1,33 @@
+"""Denormalized like count on shared_forests
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE shared_forests ADD COLUMN IF NOT EXISTS like_count integer NOT NULL DEFAULT 0")
+
+    # Recount from forest_likes so reruns converge on the right value
+    op.execute("""
+        UPDATE shared_forests SET like_count = counts.likes
+        FROM (
+            SELECT shared_forest_id, count(*) AS likes
+            FROM forest_likes
+            GROUP BY shared_forest_id
+        ) AS counts
+        WHERE shared_forests.id = counts.shared_forest_id
+          AND shared_forests.like_count <> counts.likes
+    """)
+
+
+def downgrade():
+    op.execute("ALTER TABLE shared_forests DROP COLUMN IF EXISTS like_count")
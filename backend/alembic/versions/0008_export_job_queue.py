@@ -0,0 +1,77 @@
+"""Queue columns and indexes for background export jobs
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        ALTER TABLE export_jobs
+            ADD COLUMN IF NOT EXISTS file_size bigint,
+            ADD COLUMN IF NOT EXISTS error varchar(500),
+            ADD COLUMN IF NOT EXISTS started_at timestamptz,
+            ADD COLUMN IF NOT EXISTS completed_at timestamptz
+    """)
+    # Rows from before the queue existed were only ever marked completed
+    op.execute("UPDATE export_jobs SET status = 'completed' WHERE status IS NULL")
+    op.execute("ALTER TABLE export_jobs ALTER COLUMN status SET DEFAULT 'queued'")
+    op.execute("ALTER TABLE export_jobs ALTER COLUMN status SET NOT NULL")
+
+    op.execute("ALTER TABLE export_jobs DROP CONSTRAINT IF EXISTS valid_export_format")
+    op.execute(
+        "ALTER TABLE export_jobs ADD CONSTRAINT valid_export_format "
+        "CHECK (format IN ('csv', 'json', 'ndjson'))"
+    )
+    op.execute("ALTER TABLE export_jobs DROP CONSTRAINT IF EXISTS valid_export_status")
+    op.execute(
+        "ALTER TABLE export_jobs ADD CONSTRAINT valid_export_status "
+        "CHECK (status IN ('queued', 'running', 'completed', 'failed'))"
+    )
+
+    # CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_export_jobs_queued_created_at "
+            "ON export_jobs (created_at) WHERE status = 'queued'"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_export_jobs_expires_at "
+            "ON export_jobs (expires_at)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_export_jobs_user_id_created_at "
+            "ON export_jobs (user_id, created_at DESC)"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_export_jobs_user_id_created_at")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_export_jobs_expires_at")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_export_jobs_queued_created_at")
+
+    op.execute("ALTER TABLE export_jobs DROP CONSTRAINT IF EXISTS valid_export_status")
+    op.execute("ALTER TABLE export_jobs DROP CONSTRAINT IF EXISTS valid_export_format")
+    op.execute("DELETE FROM export_jobs WHERE format = 'ndjson'")
+    op.execute(
+        "ALTER TABLE export_jobs ADD CONSTRAINT valid_export_format "
+        "CHECK (format IN ('csv', 'json'))"
+    )
+    op.execute("ALTER TABLE export_jobs ALTER COLUMN status DROP NOT NULL")
+    op.execute("ALTER TABLE export_jobs ALTER COLUMN status SET DEFAULT 'completed'")
+    op.execute("""
+        ALTER TABLE export_jobs
+            DROP COLUMN IF EXISTS completed_at,
+            DROP COLUMN IF EXISTS started_at,
+            DROP COLUMN IF EXISTS error,
+            DROP COLUMN IF EXISTS file_size
+    """)
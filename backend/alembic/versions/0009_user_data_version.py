@@ -0,0 +1,22 @@
+"""Per-user data version for the export cache
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A constant default is a catalog-only change; no table rewrite
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version integer NOT NULL DEFAULT 0")
+
+
+def downgrade():
+    op.execute("ALTER TABLE users DROP COLUMN IF EXISTS data_version")
@@ -0,0 +1,57 @@
+"""Change sequence and tombstones for log delta sync
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Constant defaults are catalog-only changes; no table rewrites. Existing
+    # logs keep change_seq 0, which every client's first full load covers
+    op.execute("""
+        ALTER TABLE users
+            ADD COLUMN IF NOT EXISTS change_seq bigint NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS sync_floor bigint NOT NULL DEFAULT 0
+    """)
+    op.execute("ALTER TABLE logs ADD COLUMN IF NOT EXISTS change_seq bigint NOT NULL DEFAULT 0")
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS log_tombstones (
+            log_id uuid PRIMARY KEY,
+            user_id uuid NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            change_seq bigint NOT NULL,
+            deleted_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_log_tombstones_user_id_change_seq "
+        "ON log_tombstones (user_id, change_seq)"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_log_tombstones_deleted_at ON log_tombstones (deleted_at)")
+
+    # CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_logs_user_id_change_seq "
+            "ON logs (user_id, change_seq)"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_logs_user_id_change_seq")
+
+    op.execute("DROP TABLE IF EXISTS log_tombstones")
+    op.execute("ALTER TABLE logs DROP COLUMN IF EXISTS change_seq")
+    op.execute("""
+        ALTER TABLE users
+            DROP COLUMN IF EXISTS change_seq,
+            DROP COLUMN IF EXISTS sync_floor
+    """)
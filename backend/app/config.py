@@ -2,11 +2,23 @@ from pydantic_settings import BaseSettings
 from typing import List
 from pathlib import Path
 import os
+import tempfile
 
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    DB_SSLMODE: str = "require"
+    DB_ECHO: bool = False
+    
+    # Connection pool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 10  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_WARMUP: int = 0  # connections to open at startup
+    DB_STATEMENT_TIMEOUT_MS: int = 15000  # request handlers only; 0 disables
     
     # JWT
     SECRET_KEY: str
@@ -20,6 +32,50 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: str = ""
     GOOGLE_CLIENT_SECRET: str = ""
 
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2  # threads; bcrypt runs outside the GIL
+    PASSWORD_HASH_MAX_QUEUE: int = 32  # waiting hashes before logins get 503
+    
+    # Authenticated-user cache (per process)
+    USER_CACHE_TTL_SECONDS: int = 30  # 0 disables
+    USER_CACHE_MAX_SIZE: int = 10000
+    
+    # Shared forests
+    VIEW_COUNT_FLUSH_SECONDS: int = 10  # how often buffered views are written
+    SHARE_CACHE_TTL_SECONDS: int = 60  # rendered public pages; also Cache-Control max-age
+    SHARE_CACHE_MAX_SIZE: int = 5000
+    SHARE_FILTER_REFRESH_SECONDS: int = 5  # poll for links created by other workers (backstop for NOTIFY)
+    SHARE_FILTER_MIN_CAPACITY: int = 100000
+    SHARE_FILTER_FALSE_POSITIVE_RATE: float = 0.001
+    
+    # Export
+    EXPORT_BATCH_SIZE: int = 1000  # rows fetched per server-side cursor round-trip
+    EXPORT_DIR: str = os.path.join(tempfile.gettempdir(), "done-list-exports")  # shared by API and workers
+    EXPORT_WORKERS: int = 2  # background export threads per process; 0 leaves jobs to other processes
+    EXPORT_JOB_POLL_SECONDS: int = 5  # idle workers check for jobs queued by other processes
+    EXPORT_JOB_TTL_HOURS: int = 24  # finished files (and failed jobs) are kept this long
+    EXPORT_JOB_TIMEOUT_MINUTES: int = 30  # running jobs older than this are marked failed
+    EXPORT_SWEEP_SECONDS: int = 600
+    EXPORT_MAX_ACTIVE_JOBS_PER_USER: int = 3
+    EXPORT_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "done-list-export-cache")
+    EXPORT_CACHE_MAX_MB: int = 512  # least recently used files are evicted past this; 0 disables
+    
+    # Log import
+    LOG_IMPORT_BATCH_SIZE: int = 5000  # rows per COPY
+    LOG_IMPORT_MAX_ROWS: int = 200000
+    
+    # Log sync (GET /logs/changes)
+    LOG_CHANGES_MAX: int = 500  # more changes than this and the client is told to reload
+    LOG_TOMBSTONE_RETENTION_DAYS: int = 30  # older sync tokens get a full reload
+    LOG_TOMBSTONE_PRUNE_SECONDS: int = 3600
+    
+    # Streaks
+    STREAK_EXPIRY_SECONDS: int = 600  # how often broken streaks are zeroed
+    
+    # Leaderboard
+    LEADERBOARD_REFRESH_SECONDS: int = 300  # full reload from the database
+    
     # App
     ENVIRONMENT: str = "development"
     API_V1_PREFIX: str = "/api/v1"
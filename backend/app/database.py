@@ -1,18 +1,98 @@
-from sqlalchemy import create_engine
+import asyncio
+import time
+import psycopg
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
 
-# Create database engine
+
+def _psycopg_url(url: str) -> str:
+    """Point a plain postgres URL at the psycopg (v3) driver"""
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+def _connect_args(statement_timeout_ms: int = 0) -> dict:
+    """Per-connection settings applied by the driver at connect time"""
+    connect_args = {"sslmode": settings.DB_SSLMODE}
+    if statement_timeout_ms > 0:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+    return connect_args
+
+
+class PoolStats:
+    """Checkout wait-time counters for the request pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts_reported = 0  # as of the last health check
+
+    def record(self, waited: float, timed_out: bool = False):
+        self.checkouts += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if timed_out:
+            self.timeouts += 1
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout had to wait"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - start)
+        return conn
+
+
+DATABASE_URL = _psycopg_url(settings.DATABASE_URL)
+
+# Create database engine (scripts, migrations, export jobs); no statement
+# timeout, since backfills and CREATE INDEX CONCURRENTLY run long and a
+# cancelled concurrent build leaves an invalid index behind
 engine = create_engine(
-    settings.DATABASE_URL,
+    DATABASE_URL,
     pool_pre_ping=True,
-    echo=settings.ENVIRONMENT == "development",
-    connect_args={"sslmode": "require"}
+    echo=settings.DB_ECHO,
+    connect_args=_connect_args()
+)
+
+# Create async database engine (request handlers)
+async_engine = create_async_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedAsyncPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    echo=settings.DB_ECHO,
+    connect_args=_connect_args(settings.DB_STATEMENT_TIMEOUT_MS)
 )
 
-# Create session factory
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 # Base class for models
 Base = declarative_base()
@@ -25,3 +105,39 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Dependency to get async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def connect_listener() -> psycopg.AsyncConnection:
+    """A dedicated autocommit connection outside the pool, for LISTEN"""
+    url = settings.DATABASE_URL.replace("postgresql+psycopg://", "postgresql://", 1)
+    return await psycopg.AsyncConnection.connect(url, autocommit=True, **_connect_args())
+
+
+async def warm_up_pool(connections: int):
+    """Open connections up front so the first requests skip the connect handshake"""
+    connections = min(connections, settings.DB_POOL_SIZE)
+    if connections <= 0:
+        return
+    conns = await asyncio.gather(*(async_engine.connect() for _ in range(connections)))
+    for conn in conns:
+        await conn.close()
+
+
+def get_pool_health() -> str:
+    """"degraded" while every pool connection is checked out or if a
+    checkout has timed out since the last call, else "ok"
+
+    Occupancy and wait-time counters stay internal; this is served to
+    unauthenticated callers.
+    """
+    pool = async_engine.pool
+    timed_out = pool_stats.timeouts > pool_stats.timeouts_reported
+    pool_stats.timeouts_reported = pool_stats.timeouts
+    saturated = pool.checkedout() >= pool.size() + settings.DB_MAX_OVERFLOW
+    return "degraded" if saturated or timed_out else "ok"
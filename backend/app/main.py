@@ -5,7 +5,16 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from app.config import settings
 from app.routes import auth, logs, streaks, share, export_data
-from app.database import Base, engine
+from app.database import Base, async_engine, warm_up_pool, get_pool_health
+from app.services import background
+from app.services.leaderboard import rebuild_leaderboard
+from app.services.view_counter import view_counter
+from app.services.share_filter import share_token_filter
+from app.services.export_jobs import export_workers, sweep_export_jobs
+from app.services.log_sync import prune_tombstones
+from app.services.streak_expiry import expire_streaks
+from app.utils.auth import password_hash_pool
+from app.utils import google_auth
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
@@ -28,12 +37,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Startup event to create tables (REMOVE AFTER FIRST SUCCESSFUL DEPLOYMENT)
 @app.on_event("startup")
-def on_startup():
-    Base.metadata.create_all(bind=engine)
+async def on_startup():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await warm_up_pool(settings.DB_POOL_WARMUP)
+    await rebuild_leaderboard()
+    background.run_periodically("leaderboard", settings.LEADERBOARD_REFRESH_SECONDS, rebuild_leaderboard)
+    background.run_periodically("view-counts", settings.VIEW_COUNT_FLUSH_SECONDS, view_counter.flush)
+    await share_token_filter.rebuild()
+    background.run_forever("share-token-listener", share_token_filter.listen)
+    background.run_periodically("share-tokens", settings.SHARE_FILTER_REFRESH_SECONDS, share_token_filter.refresh)
+    export_workers.start(settings.EXPORT_WORKERS)
+    background.run_periodically("export-sweep", settings.EXPORT_SWEEP_SECONDS, sweep_export_jobs)
+    background.run_periodically("tombstone-prune", settings.LOG_TOMBSTONE_PRUNE_SECONDS, prune_tombstones)
+    background.run_periodically("streak-expiry", settings.STREAK_EXPIRY_SECONDS, expire_streaks)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await background.stop_all()
+    await export_workers.stop()
+    await view_counter.flush()
+    password_hash_pool.shutdown()
+    await google_auth.key_source.aclose()
 
 # Include routers
 app.include_router(auth.router, prefix=f"{settings.API_V1_PREFIX}/auth", tags=["Authentication"])
@@ -55,3 +86,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/health/db")
+async def database_pool_status():
+    return {"status": get_pool_health()}
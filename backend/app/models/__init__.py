@@ -6,6 +6,8 @@ from app.models.milestone import Milestone
 from app.models.shared_forest import SharedForest
 from app.models.forest_like import ForestLike
 from app.models.export_job import ExportJob
+from app.models.daily_activity import DailyActivity
+from app.models.log_tombstone import LogTombstone
 
 __all__ = [
     "User",
@@ -15,4 +17,6 @@ __all__ = [
     "SharedForest",
     "ForestLike",
     "ExportJob",
+    "DailyActivity",
+    "LogTombstone",
 ]
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class DailyActivity(Base):
+    """Per-user, per-day rollup of logs, maintained by create_log/delete_log"""
+    __tablename__ = "daily_activity"
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    
+    points = Column(Integer, nullable=False, default=0)
+    log_count = Column(Integer, nullable=False, default=0)
+    seed_count = Column(Integer, nullable=False, default=0)
+    sapling_count = Column(Integer, nullable=False, default=0)
+    oak_count = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<DailyActivity {self.user_id} {self.date}: {self.points}>"
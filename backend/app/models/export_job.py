@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Date, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy import Column, String, Date, DateTime, BigInteger, ForeignKey, CheckConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.database import Base
@@ -15,15 +15,30 @@ class ExportJob(Base):
     date_range_start = Column(Date, nullable=True)
     date_range_end = Column(Date, nullable=True)
     
-    status = Column(String(20), default="completed")
+    status = Column(String(20), nullable=False, default="queued", server_default="queued")
     file_path = Column(String(500), nullable=True)
+    file_size = Column(BigInteger, nullable=True)  # bytes, compressed
+    error = Column(String(500), nullable=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
     expires_at = Column(DateTime(timezone=True), nullable=True)
     
     __table_args__ = (
-        CheckConstraint("format IN ('csv', 'json')", name="valid_export_format"),
+        CheckConstraint("format IN ('csv', 'json', 'ndjson')", name="valid_export_format"),
+        CheckConstraint(
+            "status IN ('queued', 'running', 'completed', 'failed')", name="valid_export_status"
+        ),
+        # Workers claim the oldest queued job
+        Index(
+            "ix_export_jobs_queued_created_at", created_at,
+            postgresql_where=text("status = 'queued'")
+        ),
+        # Sweeper looks for expired files
+        Index("ix_export_jobs_expires_at", expires_at),
+        Index("ix_export_jobs_user_id_created_at", user_id, created_at.desc()),
     )
     
     def __repr__(self):
-        return f"<ExportJob {self.id}: {self.format}>"
+        return f"<ExportJob {self.id}: {self.format} {self.status}>"
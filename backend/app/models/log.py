@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Text, DateTime, Date, ForeignKey, CheckConstraint
+from sqlalchemy import Column, String, Integer, BigInteger, Text, DateTime, Date, ForeignKey, CheckConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.database import Base
@@ -9,7 +9,7 @@ class Log(Base):
     __tablename__ = "logs"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     task_text = Column(Text, nullable=False)
     effort_level = Column(String(20), nullable=False)
@@ -17,11 +17,18 @@ class Log(Base):
     tree_emoji = Column(String(10), nullable=False)
     
     logged_at = Column(DateTime(timezone=True), server_default=func.now())
-    date = Column(Date, nullable=False, server_default=func.current_date(), index=True)
+    date = Column(Date, nullable=False, server_default=func.current_date())
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")  # users.change_seq when written
     
     __table_args__ = (
         CheckConstraint("char_length(task_text) >= 3 AND char_length(task_text) <= 500", name="task_text_length"),
         CheckConstraint("effort_level IN ('seed', 'sapling', 'oak')", name="valid_effort_level"),
+        # Keyset pagination on GET /logs: newest first, id breaks ties
+        Index("ix_logs_user_id_logged_at_id", user_id, logged_at.desc(), id.desc()),
+        # Per-day lookups (/logs/today) and date-range exports
+        Index("ix_logs_user_id_date_logged_at", user_id, date, logged_at.desc()),
+        # GET /logs/changes
+        Index("ix_logs_user_id_change_seq", user_id, change_seq),
     )
     
     def __repr__(self):
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, BigInteger, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class LogTombstone(Base):
+    """A deleted log, kept so GET /logs/changes can report the deletion"""
+    __tablename__ = "log_tombstones"
+    
+    log_id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    change_seq = Column(BigInteger, nullable=False)
+    
+    deleted_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_log_tombstones_user_id_change_seq", user_id, change_seq),
+        # Pruning
+        Index("ix_log_tombstones_deleted_at", deleted_at),
+    )
+    
+    def __repr__(self):
+        return f"<LogTombstone {self.log_id}>"
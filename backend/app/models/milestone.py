@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.database import Base
@@ -9,7 +9,7 @@ class Milestone(Base):
     __tablename__ = "milestones"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     badge_name = Column(String(100), nullable=False)
     badge_type = Column(String(50), nullable=False)
@@ -17,5 +17,10 @@ class Milestone(Base):
     
     earned_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        # One of each badge per user; also the ON CONFLICT target when awarding
+        Index("uq_milestones_user_id_badge_name", user_id, badge_name, unique=True),
+    )
+    
     def __repr__(self):
         return f"<Milestone {self.badge_name}>"
@@ -15,12 +15,17 @@ class SharedForest(Base):
     share_type = Column(String(20), nullable=False)
     is_active = Column(Boolean, default=True)
     view_count = Column(Integer, default=0)
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")  # kept in step with forest_likes
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     expires_at = Column(DateTime(timezone=True), nullable=True)
     
     __table_args__ = (
         CheckConstraint("share_type IN ('profile', 'weekly', 'monthly')", name="valid_share_type"),
+        # GET /share lists a user's links newest first
+        Index("ix_shared_forests_user_id_created_at", user_id, created_at.desc()),
+        # Share-token filter polls for links created since its last look
+        Index("ix_shared_forests_created_at", created_at),
     )
     
     def __repr__(self):
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Date, ForeignKey, CheckConstraint, UniqueConstraint
+from sqlalchemy import Column, String, Integer, Date, ForeignKey, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.database import Base
 
@@ -8,7 +8,7 @@ class Streak(Base):
     __tablename__ = "streaks"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     streak_type = Column(String(20), nullable=False)
     current_count = Column(Integer, default=0)
@@ -22,6 +22,10 @@ class Streak(Base):
     __table_args__ = (
         CheckConstraint("streak_type IN ('daily', 'weekly', 'monthly', 'yearly')", name="valid_streak_type"),
         UniqueConstraint('user_id', 'streak_type', name='unique_user_streak_type'),
+        # Daily streak leaderboard
+        Index("ix_streaks_daily_current_count", current_count.desc(), postgresql_where=(streak_type == "daily")),
+        # Streak expiry: only live streaks can break
+        Index("ix_streaks_live_type_last_updated", streak_type, last_updated, postgresql_where=(current_count > 0)),
     )
     
     def __repr__(self):
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Date
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, Date, LargeBinary, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.database import Base
@@ -20,6 +20,20 @@ class User(Base):
     total_points = Column(Integer, default=0)
     current_level = Column(Integer, default=1)
     
+    # Leaderboard windows: points earned in the week/month starting on *_start
+    week_start = Column(Date, nullable=True)
+    week_points = Column(Integer, default=0)
+    month_start = Column(Date, nullable=True)
+    month_points = Column(Integer, default=0)
+    
+    # Bumped whenever exported data changes; keys the export cache
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    # Delta sync: last change_seq given to one of the user's logs or
+    # tombstones, and the newest one pruned (older tokens must resync)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    sync_floor = Column(BigInteger, nullable=False, default=0, server_default="0")
+    
     # Settings
     is_public = Column(Boolean, default=False)
     
@@ -28,5 +42,9 @@ class User(Base):
     last_active_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     last_log_date = Column(Date, nullable=True)
     
+    # Activity bitmap: bit n set = logged on activity_epoch + n days
+    activity_epoch = Column(Date, nullable=False, server_default=func.current_date())
+    activity_bitmap = Column(LargeBinary, nullable=False, server_default=text("''::bytea"))
+    
     def __repr__(self):
         return f"<User {self.username}>"
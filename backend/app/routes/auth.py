@@ -1,12 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.user import User
 from app.models.streak import Streak
 from app.schemas.user import UserCreate, UserLogin, UserResponse, TokenResponse, UserUpdate
-from app.utils.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from app.utils.auth import (
+    get_password_hash,
+    verify_password,
+    password_needs_rehash,
+    create_access_token,
+    get_current_user,
+    get_current_user_for_update
+)
+from app.services.leaderboard import leaderboards, user_leaderboard_entry
+from app.services.user_cache import user_cache
+from app.services.share_cache import share_page_cache
+from app.utils.google_auth import verify_google_id_token
 from pydantic import BaseModel
-import httpx
 import re
 
 router = APIRouter()
@@ -16,21 +27,21 @@ class GoogleAuthRequest(BaseModel):
     credential: str  # Google ID token
 
 
-def _make_username_from_email(email: str, db: Session) -> str:
+async def _make_username_from_email(email: str, db: AsyncSession) -> str:
     base = re.sub(r'[^a-zA-Z0-9]', '', email.split('@')[0])[:20] or "user"
     username = base
     counter = 1
-    while db.query(User).filter(User.username == username).first():
+    while await db.scalar(select(User).where(User.username == username)):
         username = f"{base}{counter}"
         counter += 1
     return username
 
 
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if email already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -38,7 +49,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Check if username already exists
-    existing_username = db.query(User).filter(User.username == user_data.username).first()
+    existing_username = await db.scalar(select(User).where(User.username == user_data.username))
     if existing_username:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -49,11 +60,11 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     user = User(
         username=user_data.username,
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password)
+        password_hash=await get_password_hash(user_data.password)
     )
     
     db.add(user)
-    db.flush()  # Flush to get the user.id generated
+    await db.flush()  # Flush to get the user.id generated
     
     # Initialize streaks for new user
     streak_types = ["daily", "weekly", "monthly", "yearly"]
@@ -61,8 +72,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         streak = Streak(user_id=user.id, streak_type=streak_type)
         db.add(streak)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Create access token
     access_token = create_access_token(data={"sub": str(user.id)})
@@ -75,16 +86,26 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user"""
-    user = db.query(User).filter(User.email == user_data.email).first()
+    user = await db.scalar(select(User).where(User.email == user_data.email))
     
-    if not user or not verify_password(user_data.password, user.password_hash):
+    if (
+        not user
+        or not user.password_hash
+        or not await verify_password(user_data.password, user.password_hash)
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
+    # Upgrade hashes made with an old cost now that we have the password
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = await get_password_hash(user_data.password)
+        await db.commit()
+        user_cache.invalidate(user.id)
+    
     # Create access token
     access_token = create_access_token(data={"sub": str(user.id)})
     
@@ -104,19 +125,21 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 @router.patch("/me", response_model=UserResponse)
 async def update_user(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_for_update),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update current user information"""
     # Check if username is being changed and if it's available
     if user_update.username and user_update.username != current_user.username:
-        existing = db.query(User).filter(User.username == user_update.username).first()
+        existing = await db.scalar(select(User).where(User.username == user_update.username))
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Username already taken"
             )
         current_user.username = user_update.username
+        # The username is part of JSON exports
+        current_user.data_version = User.data_version + 1
     
     if user_update.bio is not None:
         current_user.bio = user_update.bio
@@ -127,47 +150,53 @@ async def update_user(
     if user_update.is_public is not None:
         current_user.is_public = user_update.is_public
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    user_cache.invalidate(current_user.id)
+    share_page_cache.invalidate_user(current_user.id)
+    await db.refresh(current_user)
+    
+    if current_user.is_public:
+        daily_streak = await db.scalar(select(Streak.current_count).where(
+            Streak.user_id == current_user.id,
+            Streak.streak_type == "daily"
+        ))
+        leaderboards.upsert(current_user.id, user_leaderboard_entry(current_user, daily_streak))
+    else:
+        leaderboards.remove(current_user.id)
     
     return UserResponse.model_validate(current_user)
 
 
 @router.post("/google", response_model=TokenResponse)
-async def google_auth(payload: GoogleAuthRequest, db: Session = Depends(get_db)):
+async def google_auth(payload: GoogleAuthRequest, db: AsyncSession = Depends(get_async_db)):
     """Authenticate or register a user via Google OAuth ID token"""
-    # Verify ID token with Google tokeninfo endpoint
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"https://oauth2.googleapis.com/tokeninfo?id_token={payload.credential}"
-        )
-
-    if resp.status_code != 200:
+    info = await verify_google_id_token(payload.credential)
+    if info.get("email") and not info.get("email_verified"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid Google token"
+            detail="Google account email is not verified"
         )
 
-    info = resp.json()
     google_id = info.get("sub")
     email = info.get("email")
     picture = info.get("picture")
 
     # Find existing user by google_id or email
-    user = db.query(User).filter(User.google_id == google_id).first()
+    user = await db.scalar(select(User).where(User.google_id == google_id))
     if not user and email:
-        user = db.query(User).filter(User.email == email).first()
+        user = await db.scalar(select(User).where(User.email == email))
         if user:
             # Link google_id to existing account
             user.google_id = google_id
             if picture and not user.avatar_url:
                 user.avatar_url = picture
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            user_cache.invalidate(user.id)
+            await db.refresh(user)
 
     if not user:
         # Create new user
-        username = _make_username_from_email(email, db)
+        username = await _make_username_from_email(email, db)
         user = User(
             username=username,
             email=email,
@@ -176,15 +205,15 @@ async def google_auth(payload: GoogleAuthRequest, db: Session = Depends(get_db))
             password_hash=None
         )
         db.add(user)
-        db.flush()
+        await db.flush()
 
         streak_types = ["daily", "weekly", "monthly", "yearly"]
         for streak_type in streak_types:
             streak = Streak(user_id=user.id, streak_type=streak_type)
             db.add(streak)
 
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
 
     access_token = create_access_token(data={"sub": str(user.id)})
     return TokenResponse(
@@ -1,139 +1,201 @@
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from datetime import date
-import csv
-import json
-import io
-from typing import Optional
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timezone
+from typing import List, Optional
+import os
+import uuid
+from app.config import settings
+from app.database import get_async_db
 from app.models.user import User
-from app.models.log import Log
+from app.models.export_job import ExportJob
+from app.schemas.export import ExportJobCreate, ExportJobResponse
 from app.utils.auth import get_current_user
+from app.utils.compression import negotiate_encoding, compress_stream
+from app.utils.http_cache import etag_matches, file_response
+from app.services import exporter
+from app.services.export_jobs import export_workers, ACTIVE_STATUSES
+from app.services.export_cache import export_cache, cache_key
 
 router = APIRouter()
 
 
+async def _export_response(request: Request, format: str, user: User, date_start: Optional[date],
+                           date_end: Optional[date], db: AsyncSession) -> Response:
+    """Stream an export, compressed if the client's Accept-Encoding allows
+
+    Finished bodies are kept in the export cache; a repeat request for the
+    same data is answered from the file (or with 304) without regenerating.
+    """
+    export = exporter.FORMATS[format]
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {
+        "Content-Disposition": f"attachment; filename=forest_export_{date.today().isoformat()}.{export.extension}",
+        "Vary": "Accept-Encoding"
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    body = exporter.stream_export(format, user.id, date_start, date_end)
+    if not export_cache.enabled:
+        return StreamingResponse(compress_stream(body, encoding), media_type=export.media_type, headers=headers)
+
+    # Read the version from the database: the cached user may predate a
+    # log written through another worker
+    data_version = await db.scalar(select(User.data_version).where(User.id == user.id))
+    key = cache_key(user.id, format, date_start, date_end, data_version, encoding)
+    etag = f'"{key}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+    cached = export_cache.open(key)
+    if cached:
+        return file_response(request, cached, etag, export.media_type, headers)
+
+    headers["ETag"] = etag
+    return StreamingResponse(
+        export_cache.tee(key, compress_stream(body, encoding)), media_type=export.media_type, headers=headers
+    )
+
+
 @router.get("/csv")
 async def export_csv(
+    request: Request,
     date_start: Optional[date] = Query(None),
     date_end: Optional[date] = Query(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Export user logs as CSV"""
-    # Query logs
-    query = db.query(Log).filter(Log.user_id == current_user.id)
-    
-    if date_start:
-        query = query.filter(Log.date >= date_start)
-    if date_end:
-        query = query.filter(Log.date <= date_end)
-    
-    logs = query.order_by(Log.date.desc()).all()
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(["Date", "Day", "Task", "Effort", "Points", "Tree"])
-    
-    # Write data
-    for log in logs:
-        writer.writerow([
-            log.date.isoformat(),
-            log.date.strftime("%A"),
-            log.task_text,
-            log.effort_level.capitalize(),
-            log.points_earned,
-            log.tree_emoji
-        ])
-    
-    # Prepare response
-    output.seek(0)
-    
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={
-            "Content-Disposition": f"attachment; filename=forest_export_{date.today().isoformat()}.csv"
-        }
-    )
+    """Export user logs as CSV (streamed as rows are read)"""
+    return await _export_response(request, "csv", current_user, date_start, date_end, db)
 
 
 @router.get("/json")
 async def export_json(
+    request: Request,
     date_start: Optional[date] = Query(None),
     date_end: Optional[date] = Query(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Export user logs as JSON"""
-    from app.models.streak import Streak
-    from app.models.milestone import Milestone
-    
-    # Query logs
-    query = db.query(Log).filter(Log.user_id == current_user.id)
-    
-    if date_start:
-        query = query.filter(Log.date >= date_start)
-    if date_end:
-        query = query.filter(Log.date <= date_end)
-    
-    logs = query.order_by(Log.date.desc()).all()
-    
-    # Get streaks
-    streaks = db.query(Streak).filter(Streak.user_id == current_user.id).all()
-    
-    # Get milestones
-    milestones = db.query(Milestone).filter(Milestone.user_id == current_user.id).all()
-    
-    # Build export data
-    export_data = {
-        "user": {
-            "username": current_user.username,
-            "email": current_user.email,
-            "total_points": current_user.total_points,
-            "current_level": current_user.current_level,
-            "created_at": current_user.created_at.isoformat()
-        },
-        "streaks": {
-            s.streak_type: {
-                "current": s.current_count,
-                "best": s.best_count,
-                "started_at": s.started_at.isoformat() if s.started_at else None
-            }
-            for s in streaks
-        },
-        "milestones": [
-            {
-                "badge_name": m.badge_name,
-                "badge_type": m.badge_type,
-                "description": m.description,
-                "earned_at": m.earned_at.isoformat()
-            }
-            for m in milestones
-        ],
-        "logs": [
-            {
-                "date": log.date.isoformat(),
-                "day": log.date.strftime("%A"),
-                "task": log.task_text,
-                "effort": log.effort_level,
-                "points": log.points_earned,
-                "tree": log.tree_emoji,
-                "logged_at": log.logged_at.isoformat()
-            }
-            for log in logs
-        ],
-        "exported_at": date.today().isoformat()
-    }
-    
-    return StreamingResponse(
-        iter([json.dumps(export_data, indent=2)]),
-        media_type="application/json",
-        headers={
-            "Content-Disposition": f"attachment; filename=forest_export_{date.today().isoformat()}.json"
-        }
+    """Export user data and logs as JSON (streamed, one log per line)"""
+    return await _export_response(request, "json", current_user, date_start, date_end, db)
+
+
+@router.get("/ndjson")
+async def export_ndjson(
+    request: Request,
+    date_start: Optional[date] = Query(None),
+    date_end: Optional[date] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Export as newline-delimited JSON: a header line, then one line per log"""
+    return await _export_response(request, "ndjson", current_user, date_start, date_end, db)
+
+
+def _job_response(request: Request, job: ExportJob) -> ExportJobResponse:
+    response = ExportJobResponse.model_validate(job)
+    if job.status == "completed":
+        response.download_url = request.app.url_path_for("download_export_job", job_id=str(job.id))
+    return response
+
+
+async def _get_job(job_id: uuid.UUID, user: User, db: AsyncSession) -> ExportJob:
+    job = await db.get(ExportJob, job_id)
+    if not job or job.user_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Export job not found"
+        )
+    return job
+
+
+@router.post("/jobs", response_model=ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(
+    request: Request,
+    job_data: ExportJobCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Queue an export to be generated in the background; poll GET /jobs/{id}"""
+    active = await db.scalar(
+        select(func.count()).select_from(ExportJob).where(
+            ExportJob.user_id == current_user.id,
+            ExportJob.status.in_(ACTIVE_STATUSES)
+        )
+    )
+    if active >= settings.EXPORT_MAX_ACTIVE_JOBS_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many exports in progress; wait for one to finish"
+        )
+
+    job = ExportJob(
+        user_id=current_user.id,
+        format=job_data.format,
+        date_range_start=job_data.date_start,
+        date_range_end=job_data.date_end
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    export_workers.notify()
+
+    return _job_response(request, job)
+
+
+@router.get("/jobs", response_model=List[ExportJobResponse])
+async def list_export_jobs(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The user's export jobs that haven't expired, newest first"""
+    jobs = (await db.scalars(
+        select(ExportJob)
+        .where(ExportJob.user_id == current_user.id)
+        .order_by(ExportJob.created_at.desc())
+        .limit(20)
+    )).all()
+    return [_job_response(request, job) for job in jobs]
+
+
+@router.get("/jobs/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(
+    request: Request,
+    job_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Status of an export job, with a download_url once completed"""
+    return _job_response(request, await _get_job(job_id, current_user, db))
+
+
+@router.get("/jobs/{job_id}/download", name="download_export_job")
+async def download_export_job(
+    job_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The finished export file (gzip-compressed)"""
+    job = await _get_job(job_id, current_user, db)
+    if job.status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export is {job.status}"
+        )
+    expired = job.expires_at and job.expires_at <= datetime.now(timezone.utc)
+    if expired or not os.path.exists(job.file_path):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Export has expired"
+        )
+
+    extension = exporter.FORMATS[job.format].extension
+    return FileResponse(
+        job.file_path,
+        media_type="application/gzip",
+        filename=f"forest_export_{job.created_at.date().isoformat()}.{extension}.gz"
     )
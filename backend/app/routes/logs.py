@@ -1,94 +1,275 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import date, timedelta
-from typing import List
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, func, cast, Date, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional
+import base64
+import uuid
+from app.database import get_async_db
+from app.config import settings
 from app.models.user import User
 from app.models.log import Log
-from app.schemas.log import LogCreate, LogResponse, LogCreateResponse
+from app.models.streak import Streak
+from app.models.milestone import Milestone
+from app.models.daily_activity import DailyActivity
+from app.models.log_tombstone import LogTombstone
+from app.schemas.log import (
+    LogCreate,
+    LogResponse,
+    LogCreateResponse,
+    LogImportResponse,
+    LogChangesResponse,
+    HeatmapResponse
+)
 from app.utils.auth import get_current_user
+from app.services import activity, rollups, log_import
+from app.services.recompute import recompute_user
+from app.services.leaderboard import leaderboards, user_leaderboard_entry
+from app.services.user_cache import user_cache
+from app.services.share_cache import share_page_cache
 from app.services.game_logic import (
     get_tree_emoji_for_level,
     calculate_points,
     calculate_level,
+    load_log_state,
+    add_window_points,
     update_daily_streak,
     update_weekly_streak,
     update_monthly_streak,
-    check_milestones
+    update_yearly_streak,
+    milestone_for_streak,
+    upsert_streaks_stmt,
+    award_milestone_stmt
 )
 
 router = APIRouter()
 
 
+def _encode_cursor(log: Log) -> str:
+    """Opaque keyset cursor for the position just after this log"""
+    raw = f"{log.logged_at.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        logged_at, log_id = raw.split("|")
+        return datetime.fromisoformat(logged_at), uuid.UUID(log_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
 @router.post("", response_model=LogCreateResponse, status_code=status.HTTP_201_CREATED)
 async def create_log(
     log_data: LogCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Create a new task log"""
+    """Create a new task log
+
+    Two statements: one locked read of the user and streak rows, then one
+    write that inserts the log, updates the user, upserts the streaks and
+    awards any milestone, returning the new values.
+    """
+    today = date.today()
+    user_state, streaks = await load_log_state(current_user.id, db)
+    
     # Calculate points
     points = calculate_points(log_data.effort_level)
     
     # Get tree emoji based on current level
-    tree_emoji = get_tree_emoji_for_level(current_user.current_level)
+    tree_emoji = get_tree_emoji_for_level(user_state["current_level"])
     
-    # Create log
-    log = Log(
+    # Update user stats
+    old_level = user_state["current_level"]
+    total_points = user_state["total_points"] + points
+    new_level = calculate_level(total_points)
+    
+    # Mark today in the activity bitmap
+    epoch = user_state["activity_epoch"]
+    bitmap, new_epoch = activity.mark_day(user_state["activity_bitmap"], epoch, today)
+    if new_epoch == epoch:
+        activity_values = {"activity_bitmap": activity.set_day_expr(activity.day_index(epoch, today))}
+    else:
+        activity_values = {"activity_bitmap": bitmap, "activity_epoch": new_epoch}
+    
+    # Update streaks
+    update_daily_streak(streaks["daily"], bitmap, new_epoch, today)
+    update_weekly_streak(streaks["weekly"], bitmap, new_epoch, today)
+    update_monthly_streak(streaks["monthly"], bitmap, new_epoch, today)
+    update_yearly_streak(streaks["yearly"], bitmap, new_epoch, today)
+    
+    # The user row is locked, so sequence numbers reach clients in order
+    change_seq = user_state["change_seq"] + 1
+    
+    new_log = insert(Log).values(
+        id=uuid.uuid4(),
         user_id=current_user.id,
         task_text=log_data.task_text,
         effort_level=log_data.effort_level,
         points_earned=points,
         tree_emoji=tree_emoji,
-        date=date.today()
-    )
+        date=today,
+        change_seq=change_seq
+    ).returning(*Log.__table__.c).cte("new_log")
     
-    db.add(log)
-    
-    # Update user stats
-    old_level = current_user.current_level
-    current_user.total_points += points
-    current_user.current_level = calculate_level(current_user.total_points)
-    level_up = current_user.current_level > old_level
+    updated_user = update(User).where(User.id == current_user.id).values(
+        total_points=total_points,
+        current_level=new_level,
+        last_log_date=today,
+        data_version=User.data_version + 1,
+        change_seq=change_seq,
+        **add_window_points(user_state, today, points),
+        **activity_values
+    ).returning(
+        User.total_points,
+        User.current_level,
+        User.week_start,
+        User.week_points,
+        User.month_start,
+        User.month_points
+    ).cte("updated_user")
     
-    # Update streaks
-    daily_streak = update_daily_streak(current_user, date.today(), db)
-    update_weekly_streak(current_user, date.today(), db)
-    update_monthly_streak(current_user, date.today(), db)
+    updated_streaks = upsert_streaks_stmt(current_user.id, streaks).returning(
+        Streak.streak_type, Streak.current_count
+    ).cte("updated_streaks")
     
-    # Update last log date
-    current_user.last_log_date = date.today()
+    columns = [
+        *new_log.c,
+        select(updated_user.c.total_points).scalar_subquery().label("new_total_points"),
+        select(updated_user.c.current_level).scalar_subquery().label("new_level"),
+        *(
+            select(updated_user.c[column]).scalar_subquery().label(column)
+            for column in ("week_start", "week_points", "month_start", "month_points")
+        ),
+        select(updated_streaks.c.current_count).where(
+            updated_streaks.c.streak_type == "daily"
+        ).scalar_subquery().label("new_streak"),
+    ]
     
     # Check for milestones
-    milestone_earned = check_milestones(current_user, daily_streak.current_count, db)
+    milestone = milestone_for_streak(streaks["daily"]["current_count"])
+    if milestone:
+        new_milestone = award_milestone_stmt(current_user.id, milestone).returning(
+            Milestone.badge_name
+        ).cte("new_milestone")
+        columns.append(select(new_milestone.c.badge_name).scalar_subquery().label("milestone_earned"))
+    
+    # Fold the log into the daily rollup in the same statement
+    daily_rollup = rollups.add_log_stmt(current_user.id, today, points, log_data.effort_level).cte("daily_rollup")
+    
+    row = (await db.execute(select(*columns).add_cte(daily_rollup))).one()
+    await db.commit()
+    user_cache.invalidate(current_user.id)
+    share_page_cache.invalidate_user(current_user.id)
     
-    db.commit()
-    db.refresh(log)
-    db.refresh(current_user)
-    db.refresh(daily_streak)
+    # Keep the request's user instance in step without marking it dirty
+    set_committed_value(current_user, "total_points", row.new_total_points)
+    set_committed_value(current_user, "current_level", row.new_level)
+    set_committed_value(current_user, "last_log_date", today)
+    for column in ("week_start", "week_points", "month_start", "month_points"):
+        set_committed_value(current_user, column, getattr(row, column))
+    
+    if current_user.is_public:
+        leaderboards.upsert(current_user.id, user_leaderboard_entry(current_user, row.new_streak))
     
     return LogCreateResponse(
-        log=LogResponse.model_validate(log),
+        log=LogResponse.model_validate(row._mapping),
+        new_total_points=row.new_total_points,
+        new_level=row.new_level,
+        new_streak=row.new_streak,
+        level_up=row.new_level > old_level,
+        milestone_earned=row.milestone_earned if milestone else None
+    )
+
+
+@router.post("/import", response_model=LogImportResponse)
+async def import_logs(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Bulk-import logs from a CSV, JSON or NDJSON export
+
+    Send the file as the body with its Content-Type (and Content-Encoding:
+    gzip if compressed). Logs are appended; nothing is imported if any
+    record is invalid. Streaks, points and milestones are recomputed once
+    from the full history at the end.
+    """
+    format = log_import.format_for(request.headers.get("content-type"))
+    if not format:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload text/csv, application/json or application/x-ndjson"
+        )
+    gzipped = request.headers.get("content-encoding", "").strip().lower() == "gzip"
+    
+    try:
+        imported = await log_import.import_logs(db, current_user.id, format, request.stream(), gzipped)
+    except log_import.ImportFormatError as exc:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(exc)
+        )
+    if not imported:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="No logs to import"
+        )
+    
+    result = await recompute_user(db, current_user.id)
+    await db.commit()
+    user_cache.invalidate(current_user.id)
+    share_page_cache.invalidate_user(current_user.id)
+    for column, value in result.user_values.items():
+        set_committed_value(current_user, column, value)
+    
+    if current_user.is_public:
+        leaderboards.upsert(current_user.id, user_leaderboard_entry(current_user, result.daily_streak))
+    
+    return LogImportResponse(
+        imported=imported,
         new_total_points=current_user.total_points,
         new_level=current_user.current_level,
-        new_streak=daily_streak.current_count,
-        level_up=level_up,
-        milestone_earned=milestone_earned
+        new_streak=result.daily_streak,
+        milestones_earned=result.milestones_earned
     )
 
 
 @router.get("", response_model=List[LogResponse])
 async def get_logs(
+    response: Response,
+    cursor: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get user's logs (paginated)"""
-    logs = db.query(Log).filter(
+    """Get user's logs (paginated)
+
+    Pass the X-Next-Cursor header of one page as ?cursor= to get the next;
+    ?skip= offset paging still works when no cursor is given.
+    """
+    query = select(Log).where(
         Log.user_id == current_user.id
-    ).order_by(Log.logged_at.desc()).offset(skip).limit(limit).all()
+    ).order_by(Log.logged_at.desc(), Log.id.desc())
+    
+    if cursor:
+        query = query.where(tuple_(Log.logged_at, Log.id) < tuple_(*_decode_cursor(cursor)))
+    else:
+        query = query.offset(skip)
+    
+    logs = (await db.scalars(query.limit(limit))).all()
+    
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(logs[-1])
     
     return [LogResponse.model_validate(log) for log in logs]
 
@@ -96,13 +277,13 @@ async def get_logs(
 @router.get("/today", response_model=List[LogResponse])
 async def get_today_logs(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get today's logs"""
-    logs = db.query(Log).filter(
+    logs = (await db.scalars(select(Log).where(
         Log.user_id == current_user.id,
         Log.date == date.today()
-    ).order_by(Log.logged_at.desc()).all()
+    ).order_by(Log.logged_at.desc()))).all()
     
     return [LogResponse.model_validate(log) for log in logs]
 
@@ -110,46 +291,186 @@ async def get_today_logs(
 @router.get("/week")
 async def get_weekly_data(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get last 7 days of log data for weekly graph"""
     last_7_days = [date.today() - timedelta(days=i) for i in range(6, -1, -1)]
     
-    weekly_data = []
-    for day in last_7_days:
-        total_points = db.query(func.sum(Log.points_earned)).filter(
-            Log.user_id == current_user.id,
-            Log.date == day
-        ).scalar() or 0
-        
-        weekly_data.append({
+    rows = await db.execute(select(DailyActivity.date, DailyActivity.points).where(
+        DailyActivity.user_id == current_user.id,
+        DailyActivity.date >= last_7_days[0],
+        DailyActivity.date <= last_7_days[-1]
+    ))
+    points_by_day = dict(rows.all())
+    
+    return [
+        {
             "date": day.isoformat(),
             "day": day.strftime("%a"),
-            "points": total_points
-        })
+            "points": points_by_day.get(day, 0)
+        }
+        for day in last_7_days
+    ]
+
+
+# Longest history served per bucket size (days)
+HEATMAP_MAX_DAYS = {"day": 366, "week": 366 * 5, "month": 366 * 10}
+
+
+@router.get("/heatmap", response_model=HeatmapResponse)
+async def get_heatmap(
+    days: int = Query(365, ge=1, le=HEATMAP_MAX_DAYS["month"]),
+    bucket: Literal["day", "week", "month"] = Query("day"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get per-day (or per-week/month) points and log counts for a calendar heatmap"""
+    if days > HEATMAP_MAX_DAYS[bucket]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {HEATMAP_MAX_DAYS[bucket]} days per {bucket} bucket"
+        )
+    
+    end = date.today()
+    start = activity.bucket_start(end - timedelta(days=days - 1), bucket)
+    
+    if bucket == "day":
+        bucket_column = DailyActivity.date
+    else:
+        bucket_column = cast(func.date_trunc(bucket, DailyActivity.date), Date)
+    
+    rows = await db.execute(select(
+        bucket_column,
+        func.sum(DailyActivity.points),
+        func.sum(DailyActivity.log_count)
+    ).where(
+        DailyActivity.user_id == current_user.id,
+        DailyActivity.date >= start,
+        DailyActivity.date <= end
+    ).group_by(bucket_column))
+    totals = {row[0]: (row[1], row[2]) for row in rows}
     
-    return weekly_data
+    points, counts = [], []
+    current = start
+    while current <= end:
+        bucket_points, bucket_count = totals.get(current, (0, 0))
+        points.append(bucket_points)
+        counts.append(bucket_count)
+        current = activity.next_bucket(current, bucket)
+    
+    return HeatmapResponse(bucket=bucket, start=start, end=end, points=points, counts=counts)
+
+
+@router.get("/changes", response_model=LogChangesResponse)
+async def get_log_changes(
+    since: Optional[str] = Query(None, description="token from the previous response"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the logs created and deleted since a sync token, with current totals
+
+    Call without ?since= after a full load (read the token before loading)
+    and pass each response's token to the next call. When full_resync is
+    set, reload from /logs instead of applying the delta.
+    """
+    if since is not None and not since.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token"
+        )
+    
+    # Fresh from the database; current_user may come from the user cache
+    user = (await db.execute(select(
+        User.change_seq, User.sync_floor, User.total_points, User.current_level
+    ).where(User.id == current_user.id))).one()
+    streaks = await db.execute(select(
+        Streak.streak_type, Streak.current_count, Streak.best_count
+    ).where(Streak.user_id == current_user.id))
+    
+    result = LogChangesResponse(
+        token=str(user.change_seq),
+        total_points=user.total_points,
+        current_level=user.current_level,
+        streaks={
+            row.streak_type: {"current_count": row.current_count, "best_count": row.best_count}
+            for row in streaks
+        }
+    )
+    
+    # Below the floor, deletions the client never saw have been pruned
+    if since is None or not user.sync_floor <= int(since) <= user.change_seq:
+        result.full_resync = True
+        return result
+    since = int(since)
+    if since == user.change_seq:
+        return result
+    
+    # One more than the cap tells us whether there were too many
+    logs = (await db.scalars(select(Log).where(
+        Log.user_id == current_user.id,
+        Log.change_seq > since
+    ).order_by(Log.change_seq).limit(settings.LOG_CHANGES_MAX + 1))).all()
+    deleted = (await db.scalars(select(LogTombstone.log_id).where(
+        LogTombstone.user_id == current_user.id,
+        LogTombstone.change_seq > since
+    ).order_by(LogTombstone.change_seq).limit(settings.LOG_CHANGES_MAX + 1))).all()
+    
+    if len(logs) + len(deleted) > settings.LOG_CHANGES_MAX:
+        result.full_resync = True
+        return result
+    
+    result.created = [LogResponse.model_validate(log) for log in logs]
+    result.deleted = deleted
+    return result
 
 
 @router.delete("/{log_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_log(
     log_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Delete a log (note: this doesn't recalculate streaks/points)"""
-    log = db.query(Log).filter(
+    """Delete a log and recompute streaks, points and level without it"""
+    # Lock the user row before touching the rollup, as create_log does, so
+    # a create and a delete on the same day can't take them in opposite
+    # orders and deadlock
+    await db.execute(select(User.id).where(User.id == current_user.id).with_for_update())
+    deleted_log = delete(Log).where(
         Log.id == log_id,
         Log.user_id == current_user.id
-    ).first()
+    ).returning(Log.id, Log.user_id, Log.date, Log.points_earned, Log.effort_level).cte("deleted_log")
+    daily_rollup = rollups.remove_log_stmt(current_user.id, deleted_log).cte("daily_rollup")
+    updated_user = update(User).where(User.id == deleted_log.c.user_id).values(
+        change_seq=User.change_seq + 1
+    ).returning(User.id, User.change_seq).cte("updated_user")
+    # Remember the deletion for clients syncing through /logs/changes,
+    # numbered under the user row lock
+    tombstone = insert(LogTombstone).from_select(
+        ["log_id", "user_id", "change_seq"],
+        select(deleted_log.c.id, deleted_log.c.user_id, updated_user.c.change_seq)
+        .join(updated_user, updated_user.c.id == deleted_log.c.user_id)
+    ).cte("tombstone")
     
-    if not log:
+    deleted = (await db.execute(
+        select(deleted_log.c.id).add_cte(daily_rollup).add_cte(tombstone)
+    )).first()
+    
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Log not found"
         )
     
-    db.delete(log)
-    db.commit()
+    # The rollup is already current; rederive everything else from it
+    # (recompute_user's own lock on the user row is already held)
+    result = await recompute_user(db, current_user.id, rebuild_rollup=False)
+    await db.commit()
+    user_cache.invalidate(current_user.id)
+    share_page_cache.invalidate_user(current_user.id)
+    for column, value in result.user_values.items():
+        set_committed_value(current_user, column, value)
+    
+    if current_user.is_public:
+        leaderboards.upsert(current_user.id, user_leaderboard_entry(current_user, result.daily_streak))
     
     return None
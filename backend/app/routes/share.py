@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy import select, update, literal
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 import secrets
-from app.database import get_db
+import uuid
+import time
+from app.config import settings
+from app.database import get_async_db
 from app.models.user import User
 from app.models.shared_forest import SharedForest
 from app.models.forest_like import ForestLike
@@ -9,6 +14,10 @@ from app.models.streak import Streak
 from app.models.log import Log
 from app.schemas.share import SharedForestCreate, SharedForestResponse, PublicForestData
 from app.utils.auth import get_current_user
+from app.services.view_counter import view_counter
+from app.services.share_cache import share_page_cache, SharePage
+from app.services.share_filter import share_token_filter, notify_stmt
+from app.utils.http_cache import etag_matches
 from datetime import date, timedelta
 
 router = APIRouter()
@@ -23,7 +32,7 @@ def generate_share_token() -> str:
 async def create_share_link(
     share_data: SharedForestCreate = SharedForestCreate(),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a public share link"""
     if not current_user.is_public:
@@ -32,31 +41,61 @@ async def create_share_link(
             detail="Profile must be public to share"
         )
     
-    # Generate unique token
-    token = generate_share_token()
-    while db.query(SharedForest).filter(SharedForest.share_token == token).first():
+    # Generate unique token: skip ones the filter knows are taken, and let
+    # the unique constraint catch any it can't see (revoked links, links
+    # just created by another worker)
+    share = None
+    while share is None:
         token = generate_share_token()
+        if share_token_filter.probably_taken(token):
+            continue
+        share = await db.scalar(
+            insert(SharedForest).values(
+                user_id=current_user.id,
+                share_token=token,
+                share_type=share_data.share_type
+            ).on_conflict_do_nothing(index_elements=[SharedForest.share_token]).returning(SharedForest)
+        )
     
-    share = SharedForest(
-        user_id=current_user.id,
-        share_token=token,
-        share_type=share_data.share_type
-    )
-    
-    db.add(share)
-    db.commit()
-    db.refresh(share)
+    # Delivered to every worker's listener when this commits
+    await db.execute(notify_stmt(share.share_token, share.created_at))
+    await db.commit()
+    share_token_filter.add(share.share_token, share.created_at)
     
     return SharedForestResponse.model_validate(share)
 
 
 @router.get("/{token}", response_model=PublicForestData)
-async def get_shared_forest(token: str, db: Session = Depends(get_db)):
-    """View a shared forest (public endpoint)"""
-    share = db.query(SharedForest).filter(
-        SharedForest.share_token == token,
-        SharedForest.is_active == True
-    ).first()
+async def get_shared_forest(token: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """View a shared forest (public endpoint)
+
+    Served from the page cache with a weak ETag over everything but the
+    view count; a matching If-None-Match gets an empty 304.
+    """
+    page = share_page_cache.get(token) or await _render_shared_forest(token, db)
+    
+    # Counted in memory and written in batches (see services/view_counter)
+    view_counter.record(page.share_id)
+    view_count = page.view_count + view_counter.recorded(page.share_id) - page.views_recorded
+    
+    headers = {
+        "ETag": page.etag,
+        "Cache-Control": f"public, max-age={settings.SHARE_CACHE_TTL_SECONDS}"
+    }
+    if etag_matches(request.headers.get("if-none-match"), page.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    body = page.body[:-1] + b',"view_count":%d}' % view_count
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _render_shared_forest(token: str, db: AsyncSession) -> SharePage:
+    rendered_at = time.monotonic()
+    share = None
+    if share_token_filter.might_exist(token):
+        share = await db.scalar(select(SharedForest).where(
+            SharedForest.share_token == token,
+            SharedForest.is_active == True
+        ))
     
     if not share:
         raise HTTPException(
@@ -64,32 +103,29 @@ async def get_shared_forest(token: str, db: Session = Depends(get_db)):
             detail="Share link not found or inactive"
         )
     
-    # Increment view count
-    share.view_count += 1
-    db.commit()
-    
     # Get user data
-    user = db.query(User).filter(User.id == share.user_id).first()
+    user = await db.scalar(select(User).where(User.id == share.user_id))
     
     # Get daily streak
-    daily_streak = db.query(Streak).filter(
+    daily_streak = await db.scalar(select(Streak).where(
         Streak.user_id == user.id,
         Streak.streak_type == "daily"
-    ).first()
+    ))
     
     # Get recent trees (last 7 days)
     week_ago = date.today() - timedelta(days=6)
-    recent_logs = db.query(Log).filter(
+    recent_logs = (await db.scalars(select(Log).where(
         Log.user_id == user.id,
         Log.date >= week_ago
-    ).order_by(Log.logged_at.desc()).limit(20).all()
+    ).order_by(Log.logged_at.desc()).limit(20))).all()
     
-    return PublicForestData(
+    data = PublicForestData(
         username=user.username,
         total_points=user.total_points,
         current_level=user.current_level,
         daily_streak=daily_streak.current_count if daily_streak else 0,
-        view_count=share.view_count,
+        view_count=0,  # added per request
+        like_count=share.like_count,
         recent_trees=[
             {
                 "tree": log.tree_emoji,
@@ -99,19 +135,25 @@ async def get_shared_forest(token: str, db: Session = Depends(get_db)):
             for log in recent_logs
         ]
     )
+    return share_page_cache.put(
+        token, share.id, user.id, data.model_dump_json(exclude={"view_count"}).encode(), rendered_at,
+        view_count=share.view_count + view_counter.pending(share.id),
+        views_recorded=view_counter.recorded(share.id)
+    )
 
 
 @router.delete("/{token}", status_code=status.HTTP_204_NO_CONTENT)
 async def revoke_share_link(
     token: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Revoke a share link"""
-    share = db.query(SharedForest).filter(
+    # Locked so concurrent revokes agree on whether this one deactivated it
+    share = await db.scalar(select(SharedForest).where(
         SharedForest.share_token == token,
         SharedForest.user_id == current_user.id
-    ).first()
+    ).with_for_update())
     
     if not share:
         raise HTTPException(
@@ -119,8 +161,12 @@ async def revoke_share_link(
             detail="Share link not found"
         )
     
+    was_active = share.is_active
     share.is_active = False
-    db.commit()
+    await db.commit()
+    share_page_cache.invalidate_token(token)
+    if was_active:
+        share_token_filter.remove(token, share.created_at)
     
     return None
 
@@ -128,52 +174,66 @@ async def revoke_share_link(
 @router.get("", response_model=list[SharedForestResponse])
 async def get_my_shares(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all user's share links"""
-    shares = db.query(SharedForest).filter(
+    shares = (await db.scalars(select(SharedForest).where(
         SharedForest.user_id == current_user.id
-    ).order_by(SharedForest.created_at.desc()).all()
+    ).order_by(SharedForest.created_at.desc()))).all()
     
-    return [SharedForestResponse.model_validate(s) for s in shares]
+    return [
+        SharedForestResponse.model_validate(s).model_copy(
+            update={"view_count": s.view_count + view_counter.pending(s.id)}
+        )
+        for s in shares
+    ]
 
 
 @router.post("/{token}/like", status_code=status.HTTP_201_CREATED)
 async def like_shared_forest(
     token: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Like a shared forest"""
-    share = db.query(SharedForest).filter(
+    if not share_token_filter.might_exist(token):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Share link not found"
+        )
+    
+    # One statement: find the share, insert the like unless it exists
+    # (unique_forest_like) and bump the counter only if it was inserted
+    share = select(SharedForest.id).where(
         SharedForest.share_token == token,
         SharedForest.is_active == True
-    ).first()
-    
-    if not share:
+    ).cte("share")
+    new_like = insert(ForestLike).from_select(
+        ["id", "shared_forest_id", "liker_user_id"],
+        select(literal(uuid.uuid4()), share.c.id, literal(current_user.id))
+    ).on_conflict_do_nothing(constraint="unique_forest_like").returning(ForestLike.shared_forest_id).cte("new_like")
+    updated_share = update(SharedForest).where(
+        SharedForest.id.in_(select(new_like.c.shared_forest_id))
+    ).values(like_count=SharedForest.like_count + 1).returning(SharedForest.like_count).cte("updated_share")
+    
+    row = (await db.execute(select(
+        select(share.c.id).scalar_subquery().label("share_id"),
+        select(updated_share.c.like_count).scalar_subquery().label("like_count")
+    ))).one()
+    
+    if row.share_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Share link not found"
         )
     
-    # Check if already liked
-    existing_like = db.query(ForestLike).filter(
-        ForestLike.shared_forest_id == share.id,
-        ForestLike.liker_user_id == current_user.id
-    ).first()
-    
-    if existing_like:
+    if row.like_count is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Already liked"
         )
     
-    like = ForestLike(
-        shared_forest_id=share.id,
-        liker_user_id=current_user.id
-    )
-    
-    db.add(like)
-    db.commit()
+    await db.commit()
+    share_page_cache.invalidate_token(token)
     
-    return {"message": "Liked successfully"}
+    return {"message": "Liked successfully", "like_count": row.like_count}
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 from app.models.streak import Streak
 from app.models.milestone import Milestone
 from app.schemas.streak import StreakResponse, AllStreaksResponse
 from app.schemas.milestone import MilestoneResponse
 from app.utils.auth import get_current_user
+from app.services.leaderboard import leaderboards, Leaderboards, public_fields
 
 router = APIRouter()
 
@@ -15,10 +17,10 @@ router = APIRouter()
 @router.get("", response_model=AllStreaksResponse)
 async def get_all_streaks(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all user streaks"""
-    streaks = db.query(Streak).filter(Streak.user_id == current_user.id).all()
+    streaks = (await db.scalars(select(Streak).where(Streak.user_id == current_user.id))).all()
     
     result = AllStreaksResponse()
     for streak in streaks:
@@ -31,38 +33,42 @@ async def get_all_streaks(
 @router.get("/milestones", response_model=List[MilestoneResponse])
 async def get_milestones(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all earned milestones"""
-    milestones = db.query(Milestone).filter(
+    milestones = (await db.scalars(select(Milestone).where(
         Milestone.user_id == current_user.id
-    ).order_by(Milestone.earned_at.desc()).all()
+    ).order_by(Milestone.earned_at.desc()))).all()
     
     return [MilestoneResponse.model_validate(m) for m in milestones]
 
 
 @router.get("/leaderboard")
-async def get_leaderboard(db: Session = Depends(get_db)):
-    """Get daily streak leaderboard (top 10 public users)"""
-    from sqlalchemy import desc
-    
-    leaderboard = db.query(
-        User.username,
-        User.total_points,
-        User.current_level,
-        Streak.current_count.label("streak")
-    ).join(
-        Streak, (Streak.user_id == User.id) & (Streak.streak_type == "daily")
-    ).filter(
-        User.is_public == True
-    ).order_by(desc(Streak.current_count)).limit(10).all()
-    
-    return [
-        {
-            "username": row.username,
-            "total_points": row.total_points,
-            "level": row.current_level,
-            "daily_streak": row.streak
-        }
-        for row in leaderboard
-    ]
+async def get_leaderboard(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """Get daily streak leaderboard of public users (served from memory)"""
+    return leaderboards.page("daily_streak", offset, limit)
+
+
+@router.get("/leaderboards")
+async def get_all_leaderboards(limit: int = Query(10, ge=1, le=100)):
+    """Get the top of every leaderboard at once: daily streak, points this
+    week, points this month, all-time points and level"""
+    return {
+        "week_start": leaderboards.week_start,
+        "month_start": leaderboards.month_start,
+        **{board: leaderboards.page(board, 0, limit) for board in Leaderboards.BOARDS}
+    }
+
+
+@router.get("/leaderboard/me")
+async def get_my_leaderboard_rank(current_user: User = Depends(get_current_user)):
+    """Get the current user's position on every leaderboard"""
+    entry = leaderboards.get(current_user.id)
+    return {
+        "ranks": leaderboards.ranks(current_user.id),
+        "total": len(leaderboards),
+        "entry": public_fields(entry) if entry else None
+    }
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Literal, Optional
+from datetime import datetime, date
+from uuid import UUID
+
+
+class ExportJobCreate(BaseModel):
+    format: Literal["csv", "json", "ndjson"] = "json"
+    date_start: Optional[date] = None
+    date_end: Optional[date] = None
+
+
+class ExportJobResponse(BaseModel):
+    id: UUID
+    format: str
+    date_range_start: Optional[date] = None
+    date_range_end: Optional[date] = None
+    status: Literal["queued", "running", "completed", "failed"]
+    error: Optional[str] = None
+    file_size: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    download_url: Optional[str] = None  # set once completed
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Literal, Optional
+from typing import Dict, List, Literal, Optional
 from datetime import datetime, date
 from uuid import UUID
 
@@ -29,3 +29,40 @@ class LogCreateResponse(BaseModel):
     new_streak: int
     level_up: bool = False
     milestone_earned: Optional[str] = None
+
+
+class LogImportResponse(BaseModel):
+    imported: int
+    new_total_points: int
+    new_level: int
+    new_streak: int
+    milestones_earned: List[str] = []
+
+
+class StreakCounts(BaseModel):
+    current_count: int
+    best_count: int
+
+
+class LogChangesResponse(BaseModel):
+    """What changed since a sync token, plus the user's current totals
+
+    With full_resync set the token can't be served incrementally (none
+    given, or too old); reload from /logs and sync from the returned token.
+    """
+    token: str  # pass as ?since= next time
+    full_resync: bool = False
+    created: List[LogResponse] = []
+    deleted: List[UUID] = []
+    total_points: int
+    current_level: int
+    streaks: Dict[str, StreakCounts] = {}
+
+
+class HeatmapResponse(BaseModel):
+    """Per-bucket totals as parallel arrays; index i is the i-th bucket from start"""
+    bucket: Literal["day", "week", "month"]
+    start: date
+    end: date
+    points: List[int]
+    counts: List[int]
@@ -15,6 +15,7 @@ class SharedForestResponse(BaseModel):
     share_type: str
     is_active: bool
     view_count: int
+    like_count: int
     created_at: datetime
     expires_at: Optional[datetime] = None
     
@@ -27,4 +28,5 @@ class PublicForestData(BaseModel):
     current_level: int
     daily_streak: int
     view_count: int
+    like_count: int
     recent_trees: list = []
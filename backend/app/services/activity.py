@@ -0,0 +1,114 @@
+"""
+Per-user activity bitmap: one bit per day since users.activity_epoch
+
+Bit n is set when the user logged anything on activity_epoch + n days.
+Bits are numbered the way PostgreSQL's set_bit/get_bit number them on
+bytea (bit 0 is the least significant bit of the first byte), which is
+also how int.from_bytes(..., "little") reads them, so the bytes can be
+treated as one big integer for popcounts and bit scans.
+"""
+from datetime import date, timedelta
+from sqlalchemy import func, case, literal
+from app.models.user import User
+
+
+def day_index(epoch: date, day: date) -> int:
+    """Bit position for a day"""
+    return (day - epoch).days
+
+
+def to_int(bitmap: bytes) -> int:
+    return int.from_bytes(bitmap or b"", "little")
+
+
+def to_bytes(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+def mark_day(bitmap: bytes, epoch: date, day: date) -> tuple[bytes, date]:
+    """Set the bit for a day, moving the epoch back if the day precedes it"""
+    bits = to_int(bitmap)
+    if day < epoch:
+        bits <<= day_index(day, epoch)
+        epoch = day
+    return to_bytes(bits | (1 << day_index(epoch, day))), epoch
+
+
+def from_days(epoch: date, days) -> bytes:
+    """Bitmap with the bit set for each day (none may precede epoch)"""
+    bitmap = bytearray()
+    for day in days:
+        index = day_index(epoch, day)
+        if index >> 3 >= len(bitmap):
+            bitmap.extend(bytes((index >> 3) + 1 - len(bitmap)))
+        bitmap[index >> 3] |= 1 << (index & 7)
+    return bytes(bitmap)
+
+
+def is_active(bitmap: bytes, epoch: date, day: date) -> bool:
+    index = day_index(epoch, day)
+    return index >= 0 and bool(to_int(bitmap) >> index & 1)
+
+
+def count_active(bitmap: bytes, epoch: date, start: date, end: date) -> int:
+    """Number of active days in [start, end] (popcount over the range)"""
+    first = max(day_index(epoch, start), 0)
+    last = day_index(epoch, end)
+    if last < first:
+        return 0
+    window = (to_int(bitmap) >> first) & ((1 << (last - first + 1)) - 1)
+    return window.bit_count()
+
+
+def run_ending_at(bitmap: bytes, epoch: date, day: date) -> int:
+    """Length of the run of consecutive active days ending on day"""
+    index = day_index(epoch, day)
+    if index < 0:
+        return 0
+    mask = (1 << (index + 1)) - 1
+    gaps = ~to_int(bitmap) & mask
+    # The highest clear bit at or below index ends the run
+    return index + 1 if gaps == 0 else index - (gaps.bit_length() - 1)
+
+
+def set_day_expr(index: int):
+    """SQL for OR-ing one day's bit into users.activity_bitmap in place"""
+    byte = index // 8
+    padded = case(
+        (func.length(User.activity_bitmap) > byte, User.activity_bitmap),
+        else_=User.activity_bitmap.op("||")(
+            func.decode(func.repeat("00", byte + 1 - func.length(User.activity_bitmap)), "hex")
+        )
+    )
+    return func.set_bit(padded, literal(index), 1)
+
+
+def week_bounds(day: date) -> tuple[date, date]:
+    start = day - timedelta(days=day.weekday())
+    return start, start + timedelta(days=6)
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def previous_month_bounds(day: date) -> tuple[date, date]:
+    end = month_start(day) - timedelta(days=1)
+    return month_start(end), end
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    """First day of the day/week/month bucket containing day"""
+    if bucket == "week":
+        return week_bounds(day)[0]
+    if bucket == "month":
+        return month_start(day)
+    return day
+
+
+def next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
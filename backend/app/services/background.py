@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+_tasks: list[asyncio.Task] = []
+
+
+async def _run_every(name: str, interval: float, job: Callable[[], Awaitable[None]]):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except Exception:
+            logger.exception("Background job %s failed", name)
+
+
+async def _run_forever(name: str, job: Callable[[], Awaitable[None]], retry: float):
+    while True:
+        try:
+            await job()
+        except Exception:
+            logger.exception("Background job %s failed", name)
+        await asyncio.sleep(retry)
+
+
+def run_forever(name: str, job: Callable[[], Awaitable[None]], retry: float = 5):
+    """Run a long-lived job on the event loop until shutdown, restarting it
+    retry seconds after it fails or returns"""
+    _tasks.append(asyncio.create_task(_run_forever(name, job, retry), name=name))
+
+
+def run_periodically(name: str, interval: float, job: Callable[[], Awaitable[None]]):
+    """Run job every interval seconds on the event loop until shutdown"""
+    _tasks.append(asyncio.create_task(_run_every(name, interval, job), name=name))
+
+
+async def stop_all():
+    """Cancel every background job (called on shutdown)"""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -0,0 +1,106 @@
+"""
+On-disk cache of generated exports
+
+A file is keyed by everything that decides its bytes: user, format, date
+range, the user's data_version (bumped whenever their logs or exported
+profile fields change), the export date for formats whose header carries
+exported_at, and the content encoding. Repeat requests for an unchanged
+export are served from the file instead of being regenerated.
+
+Files live in EXPORT_CACHE_DIR, shared by every process on the host. A hit
+touches the file's mtime, and each new file evicts the least recently used
+ones once the directory passes EXPORT_CACHE_MAX_MB.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from datetime import date
+from typing import AsyncIterator, BinaryIO, Optional
+from app.config import settings
+from app.services.exporter import FORMATS
+
+# Partial files older than this belong to a process that died mid-write
+ABANDONED_PARTIAL_SECONDS = 3600
+
+
+def cache_key(user_id, format: str, date_start: Optional[date], date_end: Optional[date],
+              data_version: int, encoding: Optional[str]) -> str:
+    exported_on = date.today() if FORMATS[format].needs_header else None
+    parts = (user_id, format, date_start, date_end, data_version, exported_on, encoding or "identity")
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+
+
+class ExportCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def open(self, key: str) -> Optional[BinaryIO]:
+        """The cached file opened for reading, or None
+
+        Holding the file open keeps it readable if it's evicted meanwhile.
+        """
+        path = self._path(key)
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return file
+
+    async def tee(self, key: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Pass chunks through, keeping a copy that's cached once complete"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, partial_path = tempfile.mkstemp(dir=self.directory, suffix=".partial")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                async for chunk in chunks:
+                    file.write(chunk)
+                    yield chunk
+            os.replace(partial_path, self._path(key))
+        except BaseException:
+            # Includes the client going away mid-stream
+            os.remove(partial_path)
+            raise
+        await asyncio.to_thread(self.evict)
+
+    def evict(self):
+        """Delete least recently used files until under the size cap"""
+        now = time.time()
+        files = []
+        total = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                stat = entry.stat()
+                if entry.name.endswith(".partial"):
+                    if stat.st_mtime < now - ABANDONED_PARTIAL_SECONDS:
+                        _remove(entry.path)
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            _remove(path)
+            total -= size
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+export_cache = ExportCache(settings.EXPORT_CACHE_DIR, settings.EXPORT_CACHE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,244 @@
+"""
+Background export jobs
+
+POST /export/jobs queues an ExportJob row. Each process runs
+EXPORT_WORKERS workers that claim the oldest queued job with
+FOR UPDATE SKIP LOCKED, so any number of processes can share the queue
+without handing a job out twice. The export itself runs on a thread with
+the sync engine (see exporter.export_to_file), streaming logs through a
+server-side cursor into a gzip file under EXPORT_DIR, away from the event
+loop that serves interactive requests.
+
+Jobs move queued -> running -> completed | failed. Each run writes to its
+own file name and only records it if the job is still the same run, so a
+job that timed out or was requeued can't be overwritten by a straggler.
+The sweeper deletes jobs (and files) past expires_at, fails jobs running
+longer than EXPORT_JOB_TIMEOUT_MINUTES and clears files nothing points to.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import NamedTuple, Optional
+from sqlalchemy import select, update, delete, func
+from app.config import settings
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models.export_job import ExportJob
+from app.models.user import User
+from app.services import exporter
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class ClaimedJob(NamedTuple):
+    id: uuid.UUID
+    user_id: uuid.UUID
+    format: str
+    date_range_start: Optional[date]
+    date_range_end: Optional[date]
+    started_at: datetime
+
+
+def _same_run(job: ClaimedJob):
+    return (
+        ExportJob.id == job.id,
+        ExportJob.status == "running",
+        ExportJob.started_at == job.started_at,
+    )
+
+
+def _file_path(job: ClaimedJob) -> str:
+    run = job.started_at.strftime("%Y%m%d%H%M%S%f")
+    return os.path.join(settings.EXPORT_DIR, f"{job.id}-{run}.{exporter.FORMATS[job.format].extension}.gz")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _generate(job: ClaimedJob, path: str, stop: threading.Event) -> int:
+    """Write the export file (runs on a worker thread)"""
+    with SessionLocal() as db:
+        user = db.get(User, job.user_id)
+        if user is None:
+            raise LookupError(f"user {job.user_id} no longer exists")
+        return exporter.export_to_file(
+            db, job.format, user, job.date_range_start, job.date_range_end, path, stop=stop
+        )
+
+
+async def claim_next_job() -> Optional[ClaimedJob]:
+    """Mark the oldest queued job running and return it"""
+    next_job = (
+        select(ExportJob.id)
+        .where(ExportJob.status == "queued")
+        .order_by(ExportJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            update(ExportJob)
+            .where(ExportJob.id == next_job)
+            .values(status="running", started_at=func.now())
+            .returning(
+                ExportJob.id,
+                ExportJob.user_id,
+                ExportJob.format,
+                ExportJob.date_range_start,
+                ExportJob.date_range_end,
+                ExportJob.started_at
+            )
+        )).first()
+        await db.commit()
+    return ClaimedJob(*row) if row else None
+
+
+async def _finish(job: ClaimedJob, **values) -> bool:
+    """Record a run's outcome; False if the job is no longer this run"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(ExportJob)
+            .where(*_same_run(job))
+            .values(
+                **values,
+                completed_at=func.now(),
+                expires_at=func.now() + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)
+            )
+        )
+        await db.commit()
+    return result.rowcount == 1
+
+
+class ExportWorkers:
+    def __init__(self):
+        self._executor: ThreadPoolExecutor | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._stop = threading.Event()
+        self._running: dict[uuid.UUID, ClaimedJob] = {}
+
+    def start(self, workers: int):
+        if workers <= 0 or self._tasks:
+            return
+        os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"export-worker-{n}") for n in range(workers)
+        ]
+
+    def notify(self):
+        """A job was just queued; wake idle workers instead of waiting for the poll"""
+        self._wake.set()
+
+    async def _work(self):
+        while True:
+            self._wake.clear()
+            try:
+                job = await claim_next_job()
+            except Exception:
+                logger.exception("Claiming an export job failed")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), settings.EXPORT_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: ClaimedJob):
+        path = _file_path(job)
+        # Left in place if the worker is cancelled, so stop() can requeue it
+        self._running[job.id] = job
+        loop = asyncio.get_running_loop()
+        try:
+            size = await loop.run_in_executor(self._executor, _generate, job, path, self._stop)
+        except Exception:
+            del self._running[job.id]
+            logger.exception("Export job %s failed", job.id)
+            await _finish(job, status="failed", error="Export failed")
+            return
+
+        del self._running[job.id]
+        if not await _finish(job, status="completed", file_path=path, file_size=size):
+            # Timed out or requeued while running; another run owns the job
+            _remove(path)
+
+    async def stop(self):
+        """Cancel the workers and put their unfinished jobs back in the queue"""
+        if not self._tasks:
+            return
+        self._stop.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        unfinished = list(self._running.values())
+        self._running.clear()
+        if unfinished:
+            async with AsyncSessionLocal() as db:
+                for job in unfinished:
+                    await db.execute(
+                        update(ExportJob).where(*_same_run(job)).values(status="queued", started_at=None)
+                    )
+                await db.commit()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+
+export_workers = ExportWorkers()
+
+
+def _remove_stray_files():
+    """Delete files no job points to: past the TTL, or partial past the timeout"""
+    if not os.path.isdir(settings.EXPORT_DIR):
+        return
+    now = time.time()
+    expired = now - settings.EXPORT_JOB_TTL_HOURS * 3600
+    abandoned = now - settings.EXPORT_JOB_TIMEOUT_MINUTES * 60
+    with os.scandir(settings.EXPORT_DIR) as entries:
+        for entry in entries:
+            cutoff = abandoned if entry.name.endswith(".partial") else expired
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                _remove(entry.path)
+
+
+async def sweep_export_jobs():
+    """Fail stuck jobs and delete expired ones along with their files"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(ExportJob)
+            .where(
+                ExportJob.status == "running",
+                ExportJob.started_at < func.now() - timedelta(minutes=settings.EXPORT_JOB_TIMEOUT_MINUTES)
+            )
+            .values(
+                status="failed",
+                error="Export timed out",
+                completed_at=func.now(),
+                expires_at=func.now() + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)
+            )
+        )
+        expired = (await db.scalars(
+            delete(ExportJob).where(ExportJob.expires_at < func.now()).returning(ExportJob.file_path)
+        )).all()
+        await db.commit()
+
+    for path in expired:
+        if path:
+            _remove(path)
+    # Jobs deleted with their user, or runs cut off by a crash
+    await asyncio.to_thread(_remove_stray_files)
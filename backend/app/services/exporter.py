@@ -0,0 +1,251 @@
+"""
+Export bodies, streamed in bounded memory
+
+Each format turns a stream of log-row batches into text chunks. The
+async generators feed StreamingResponses; export_to_file drives the same
+formats with the sync engine for background jobs (see export_jobs).
+
+Generators open their own session: FastAPI closes yield dependencies
+before a StreamingResponse starts sending, so the request's session is
+gone by the time the body is produced. They load the user there too,
+rather than taking the request's (possibly cached) User, so a body is
+never older than the data_version its cache key was read at. Rows come from a server-side
+cursor EXPORT_BATCH_SIZE at a time, so memory stays flat however many
+logs a user has, and the first chunk goes out before the logs query runs.
+"""
+import csv
+import io
+import json
+import os
+import threading
+import uuid
+from datetime import date
+from typing import AsyncIterator, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.models.log import Log
+from app.models.streak import Streak
+from app.models.milestone import Milestone
+from app.utils.compression import compressor_for
+
+CSV_HEADER = ["Date", "Day", "Task", "Effort", "Points", "Tree"]
+
+
+class ExportCancelled(Exception):
+    """export_to_file was asked to stop before finishing"""
+
+
+def logs_query(user_id: uuid.UUID, date_start: Optional[date], date_end: Optional[date]):
+    """A user's logs in an optional date range, newest day first"""
+    query = select(
+        Log.date,
+        Log.task_text,
+        Log.effort_level,
+        Log.points_earned,
+        Log.tree_emoji,
+        Log.logged_at
+    ).where(Log.user_id == user_id)
+
+    if date_start:
+        query = query.where(Log.date >= date_start)
+    if date_end:
+        query = query.where(Log.date <= date_end)
+
+    return query.order_by(Log.date.desc()).execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+
+
+def _streaks_query(user_id: uuid.UUID):
+    return select(Streak).where(Streak.user_id == user_id)
+
+
+def _milestones_query(user_id: uuid.UUID):
+    return select(Milestone).where(Milestone.user_id == user_id)
+
+
+def export_header(user: User, streaks: list[Streak], milestones: list[Milestone]) -> dict:
+    """Everything in a JSON export except the logs"""
+    return {
+        "user": {
+            "username": user.username,
+            "email": user.email,
+            "total_points": user.total_points,
+            "current_level": user.current_level,
+            "created_at": user.created_at.isoformat()
+        },
+        "streaks": {
+            s.streak_type: {
+                "current": s.current_count,
+                "best": s.best_count,
+                "started_at": s.started_at.isoformat() if s.started_at else None
+            }
+            for s in streaks
+        },
+        "milestones": [
+            {
+                "badge_name": m.badge_name,
+                "badge_type": m.badge_type,
+                "description": m.description,
+                "earned_at": m.earned_at.isoformat()
+            }
+            for m in milestones
+        ],
+        "exported_at": date.today().isoformat()
+    }
+
+
+class DayColumns(dict):
+    """date -> (ISO date, weekday name), computed on first use"""
+
+    def __missing__(self, day: date) -> tuple[str, str]:
+        self[day] = columns = (day.isoformat(), day.strftime("%A"))
+        return columns
+
+
+class CsvFormat:
+    """Logs only: a header row, then one row per log"""
+
+    media_type = "text/csv"
+    extension = "csv"
+    needs_header = False
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        # Many logs share a day; format each date once
+        self._days = DayColumns()
+
+    def _drain(self) -> str:
+        chunk = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return chunk
+
+    def start(self, header: Optional[dict]) -> str:
+        self._writer.writerow(CSV_HEADER)
+        return self._drain()
+
+    def rows(self, batch) -> str:
+        self._writer.writerows(
+            (*self._days[day], task, effort.capitalize(), points, tree)
+            for day, task, effort, points, tree, _ in batch
+        )
+        return self._drain()
+
+    def end(self) -> str:
+        return ""
+
+
+class JsonFormat:
+    """The header fields, then "logs" as an array with one log per line"""
+
+    media_type = "application/json"
+    extension = "json"
+    needs_header = True
+
+    def __init__(self):
+        self._days = DayColumns()
+        self._separator = ""
+
+    def _log(self, row) -> str:
+        day, task, effort, points, tree, logged_at = row
+        iso_date, weekday = self._days[day]
+        return json.dumps({
+            "date": iso_date,
+            "day": weekday,
+            "task": task,
+            "effort": effort,
+            "points": points,
+            "tree": tree,
+            "logged_at": logged_at.isoformat()
+        }, ensure_ascii=False)
+
+    def start(self, header: Optional[dict]) -> str:
+        # Reopen the header object to append the logs array
+        return json.dumps(header, ensure_ascii=False)[:-1] + ', "logs": [\n'
+
+    def rows(self, batch) -> str:
+        chunk = self._separator + ",\n".join(self._log(row) for row in batch)
+        self._separator = ",\n"
+        return chunk
+
+    def end(self) -> str:
+        return "\n]}\n"
+
+
+class NdjsonFormat(JsonFormat):
+    """A {"type": "export", ...} header line, then one {"type": "log", ...}
+    line per log"""
+
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def start(self, header: Optional[dict]) -> str:
+        return json.dumps({"type": "export", **header}, ensure_ascii=False) + "\n"
+
+    def rows(self, batch) -> str:
+        return "".join('{"type": "log", ' + self._log(row)[1:] + "\n" for row in batch)
+
+    def end(self) -> str:
+        return ""
+
+
+FORMATS = {"csv": CsvFormat, "json": JsonFormat, "ndjson": NdjsonFormat}
+
+
+async def stream_export(format: str, user_id: uuid.UUID, date_start: Optional[date],
+                        date_end: Optional[date]) -> AsyncIterator[str]:
+    """Export body as text chunks, read through a server-side cursor"""
+    export = FORMATS[format]()
+    async with AsyncSessionLocal() as db:
+        header = None
+        if export.needs_header:
+            header = export_header(
+                await db.get(User, user_id),
+                (await db.scalars(_streaks_query(user_id))).all(),
+                (await db.scalars(_milestones_query(user_id))).all()
+            )
+        yield export.start(header)
+
+        result = await db.stream(logs_query(user_id, date_start, date_end))
+        async for batch in result.partitions():
+            yield export.rows(batch)
+    yield export.end()
+
+
+def export_to_file(db: Session, format: str, user: User, date_start: Optional[date],
+                   date_end: Optional[date], path: str, encoding: Optional[str] = "gzip",
+                   stop: Optional[threading.Event] = None) -> int:
+    """Write an export to path with the sync engine; returns the file size
+
+    The file appears at path only once complete. Setting stop abandons the
+    export at the next batch with ExportCancelled.
+    """
+    export = FORMATS[format]()
+    compressor = compressor_for(encoding)
+    header = None
+    if export.needs_header:
+        header = export_header(
+            user,
+            db.scalars(_streaks_query(user.id)).all(),
+            db.scalars(_milestones_query(user.id)).all()
+        )
+
+    partial_path = path + ".partial"
+    try:
+        with open(partial_path, "wb") as file:
+            file.write(compressor.chunk(export.start(header).encode()))
+            for batch in db.execute(logs_query(user.id, date_start, date_end)).partitions():
+                if stop is not None and stop.is_set():
+                    raise ExportCancelled(path)
+                file.write(compressor.chunk(export.rows(batch).encode()))
+            file.write(compressor.chunk(export.end().encode()) + compressor.end())
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    return os.path.getsize(path)
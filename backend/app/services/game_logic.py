@@ -1,9 +1,13 @@
 import random
+import uuid
 from datetime import date, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import select, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
 from app.models.streak import Streak
 from app.models.milestone import Milestone
+from app.services import activity
 
 
 # Tree emoji mappings based on level
@@ -21,6 +25,19 @@ EFFORT_POINTS = {
     "oak": (60, 150)
 }
 
+# Streaks maintained on every log
+LOG_STREAK_TYPES = ("daily", "weekly", "monthly", "yearly")
+
+# Daily streak badges: (threshold, badge_name, badge_type, description)
+MILESTONE_CONFIGS = [
+    (3, "3-Day Starter", "streak", "Logged for 3 consecutive days"),
+    (7, "7-Day Warrior", "streak", "Logged for 7 consecutive days"),
+    (10, "10-Day Champion", "streak", "Logged for 10 consecutive days"),
+    (30, "30-Day Legend", "streak", "Logged for 30 consecutive days"),
+]
+
+STREAK_STATE_FIELDS = ("id", "current_count", "best_count", "started_at", "last_updated", "streak_metadata")
+
 
 def get_tree_emoji_for_level(level: int) -> str:
     """Get a random tree emoji based on user level"""
@@ -47,166 +64,272 @@ def calculate_level(total_points: int) -> int:
     return (total_points // 500) + 1
 
 
-def update_daily_streak(user: User, log_date: date, db: Session) -> Streak:
-    """Update daily streak logic"""
-    streak = db.query(Streak).filter(
-        Streak.user_id == user.id,
-        Streak.streak_type == "daily"
-    ).first()
-    
-    if not streak:
-        streak = Streak(user_id=user.id, streak_type="daily")
-        db.add(streak)
-    
-    last_log = user.last_log_date
-    
-    if last_log is None:
-        # First ever log
-        streak.current_count = 1
-        streak.started_at = log_date
-    elif log_date == last_log:
-        # Same day, no change
-        pass
-    elif log_date == last_log + timedelta(days=1):
-        # Consecutive day
-        streak.current_count += 1
-    elif log_date > last_log + timedelta(days=1):
-        # Missed a day, reset
-        streak.current_count = 1
-        streak.started_at = log_date
+def new_streak_state() -> dict:
+    """Starting values for a streak row that does not exist yet"""
+    return {
+        "id": uuid.uuid4(),
+        "current_count": 0,
+        "best_count": 0,
+        "started_at": None,
+        "last_updated": None,
+        "streak_metadata": {},
+    }
+
+
+async def load_log_state(user_id, db: AsyncSession) -> tuple[dict, dict]:
+    """Lock the user row and load everything create_log needs in one query
+
+    Returns (user_state, streaks) where streaks maps streak_type to a plain
+    dict of the row's values. Missing streak rows get fresh defaults.
+    """
+    rows = (await db.execute(
+        select(
+            User.total_points,
+            User.current_level,
+            User.activity_epoch,
+            User.activity_bitmap,
+            User.week_start,
+            User.week_points,
+            User.month_start,
+            User.month_points,
+            User.change_seq,
+            Streak.streak_type,
+            *(getattr(Streak, field) for field in STREAK_STATE_FIELDS)
+        ).select_from(User).outerjoin(
+            Streak,
+            and_(Streak.user_id == User.id, Streak.streak_type.in_(LOG_STREAK_TYPES))
+        ).where(User.id == user_id).with_for_update(of=User)
+    )).all()
+
+    if not rows:
+        return None, {}
+
+    first = rows[0]
+    user_state = {
+        "total_points": first.total_points or 0,
+        "current_level": first.current_level or 1,
+        "activity_epoch": first.activity_epoch,
+        "activity_bitmap": first.activity_bitmap or b"",
+        "week_start": first.week_start,
+        "week_points": first.week_points or 0,
+        "month_start": first.month_start,
+        "month_points": first.month_points or 0,
+        "change_seq": first.change_seq,
+    }
+
+    streaks = {streak_type: new_streak_state() for streak_type in LOG_STREAK_TYPES}
+    for row in rows:
+        if row.streak_type is not None:
+            streaks[row.streak_type] = {
+                "id": row.id,
+                "current_count": row.current_count or 0,
+                "best_count": row.best_count or 0,
+                "started_at": row.started_at,
+                "last_updated": row.last_updated,
+                "streak_metadata": dict(row.streak_metadata or {}),
+            }
+
+    return user_state, streaks
+
+
+def add_window_points(user_state: dict, log_date: date, points: int) -> dict:
+    """users.week_*/month_* values after earning points on log_date
+
+    A stored window that is not the current one has rolled over and
+    restarts from zero.
+    """
+    week_start = activity.week_bounds(log_date)[0]
+    month_start = activity.month_start(log_date)
+    week_points = user_state["week_points"] if user_state["week_start"] == week_start else 0
+    month_points = user_state["month_points"] if user_state["month_start"] == month_start else 0
+    return {
+        "week_start": week_start,
+        "week_points": week_points + points,
+        "month_start": month_start,
+        "month_points": month_points + points,
+    }
+
+
+def update_daily_streak(streak: dict, bitmap: bytes, epoch: date, log_date: date) -> dict:
+    """Update daily streak (consecutive active days ending on log_date)"""
+    streak["current_count"] = activity.run_ending_at(bitmap, epoch, log_date)
+    streak["started_at"] = log_date - timedelta(days=streak["current_count"] - 1)
     
     # Update best streak
-    if streak.current_count > streak.best_count:
-        streak.best_count = streak.current_count
+    if streak["current_count"] > streak["best_count"]:
+        streak["best_count"] = streak["current_count"]
     
-    streak.last_updated = log_date
+    streak["last_updated"] = log_date
     
     return streak
 
 
-def update_weekly_streak(user: User, log_date: date, db: Session) -> Streak:
+def update_weekly_streak(streak: dict, bitmap: bytes, epoch: date, log_date: date) -> dict:
     """Update weekly streak (user must log 5+ days in a week)"""
-    from sqlalchemy import func, extract
-    from app.models.log import Log
-    
-    streak = db.query(Streak).filter(
-        Streak.user_id == user.id,
-        Streak.streak_type == "weekly"
-    ).first()
-    
-    if not streak:
-        streak = Streak(user_id=user.id, streak_type="weekly")
-        db.add(streak)
-    
-    # Get ISO week number
-    current_week = log_date.isocalendar()[1]
-    current_year = log_date.year
+    # Get ISO week label
+    iso_year, iso_week, _ = log_date.isocalendar()
+    current_week = f"{iso_year}-W{iso_week:02d}"
     
     # Count unique days logged this week
-    week_start = log_date - timedelta(days=log_date.weekday())
-    week_end = week_start + timedelta(days=6)
-    
-    days_logged = db.query(func.count(func.distinct(Log.date))).filter(
-        Log.user_id == user.id,
-        Log.date >= week_start,
-        Log.date <= week_end
-    ).scalar()
+    week_start, week_end = activity.week_bounds(log_date)
+    days_logged = activity.count_active(bitmap, epoch, week_start, week_end)
     
     # Store in metadata
-    metadata = streak.streak_metadata or {}
-    metadata["current_week"] = f"{current_year}-W{current_week:02d}"
+    metadata = streak["streak_metadata"]
+    metadata["current_week"] = current_week
     metadata["days_active_this_week"] = days_logged
-    streak.streak_metadata = metadata
-    
-    # Check if week is complete and active (5+ days)
-    if days_logged >= 5 and log_date.weekday() == 6:  # Sunday
-        last_week = metadata.get("last_active_week")
-        if last_week is None:
-            streak.current_count = 1
-        elif f"{current_year}-W{current_week - 1:02d}" == last_week:
-            streak.current_count += 1
+    
+    # The week counts once it reaches 5 active days
+    if days_logged >= 5 and metadata.get("last_active_week") != current_week:
+        last_week_days = activity.count_active(
+            bitmap, epoch, week_start - timedelta(days=7), week_start - timedelta(days=1)
+        )
+        if last_week_days >= 5 and streak["current_count"] > 0:
+            streak["current_count"] += 1
         else:
-            streak.current_count = 1
+            streak["current_count"] = 1
+            streak["started_at"] = week_start
         
-        metadata["last_active_week"] = f"{current_year}-W{current_week:02d}"
-        streak.streak_metadata = metadata
+        metadata["last_active_week"] = current_week
         
-        if streak.current_count > streak.best_count:
-            streak.best_count = streak.current_count
+        if streak["current_count"] > streak["best_count"]:
+            streak["best_count"] = streak["current_count"]
     
-    streak.last_updated = log_date
+    streak["last_updated"] = log_date
     
     return streak
 
 
-def update_monthly_streak(user: User, log_date: date, db: Session) -> Streak:
+def update_monthly_streak(streak: dict, bitmap: bytes, epoch: date, log_date: date) -> dict:
     """Update monthly streak (user must log at least once per month)"""
-    streak = db.query(Streak).filter(
-        Streak.user_id == user.id,
-        Streak.streak_type == "monthly"
-    ).first()
-    
-    if not streak:
-        streak = Streak(user_id=user.id, streak_type="monthly")
-        db.add(streak)
-    
     current_month = log_date.strftime("%Y-%m")
-    last_month = (streak.streak_metadata or {}).get("last_active_month")
+    metadata = streak["streak_metadata"]
     
-    if last_month is None:
-        streak.current_count = 1
-        streak.started_at = log_date
-    elif current_month == last_month:
+    if metadata.get("last_active_month") == current_month:
         # Same month, no change
         pass
     else:
-        # Check if consecutive month
-        last_date = date.fromisoformat(f"{last_month}-01")
-        if log_date.year == last_date.year and log_date.month == last_date.month + 1:
-            streak.current_count += 1
-        elif log_date.year == last_date.year + 1 and log_date.month == 1 and last_date.month == 12:
-            streak.current_count += 1
+        last_month_start, last_month_end = activity.previous_month_bounds(log_date)
+        if activity.count_active(bitmap, epoch, last_month_start, last_month_end) and streak["current_count"] > 0:
+            # Consecutive month
+            streak["current_count"] += 1
         else:
-            streak.current_count = 1
-            streak.started_at = log_date
+            streak["current_count"] = 1
+            streak["started_at"] = log_date
     
-    metadata = streak.streak_metadata or {}
     metadata["last_active_month"] = current_month
-    streak.streak_metadata = metadata
     
-    if streak.current_count > streak.best_count:
-        streak.best_count = streak.current_count
+    if streak["current_count"] > streak["best_count"]:
+        streak["best_count"] = streak["current_count"]
     
-    streak.last_updated = log_date
+    streak["last_updated"] = log_date
     
     return streak
 
 
-def check_milestones(user: User, daily_streak: int, db: Session) -> str | None:
-    """Check and award milestones"""
-    milestone_configs = [
-        (3, "3-Day Starter", "streak", "Logged for 3 consecutive days"),
-        (7, "7-Day Warrior", "streak", "Logged for 7 consecutive days"),
-        (10, "10-Day Champion", "streak", "Logged for 10 consecutive days"),
-        (30, "30-Day Legend", "streak", "Logged for 30 consecutive days"),
-    ]
+def update_yearly_streak(streak: dict, bitmap: bytes, epoch: date, log_date: date) -> dict:
+    """Update yearly streak (user must log at least once per calendar year)"""
+    current_year = str(log_date.year)
+    metadata = streak["streak_metadata"]
     
-    for threshold, badge_name, badge_type, description in milestone_configs:
-        if daily_streak == threshold:
-            # Check if already earned
-            existing = db.query(Milestone).filter(
-                Milestone.user_id == user.id,
-                Milestone.badge_name == badge_name
-            ).first()
-            
-            if not existing:
-                milestone = Milestone(
-                    user_id=user.id,
-                    badge_name=badge_name,
-                    badge_type=badge_type,
-                    description=description
-                )
-                db.add(milestone)
-                return badge_name
+    if metadata.get("last_active_year") != current_year:
+        last_year = log_date.year - 1
+        last_year_active = activity.count_active(bitmap, epoch, date(last_year, 1, 1), date(last_year, 12, 31))
+        if last_year_active and streak["current_count"] > 0:
+            # Consecutive year
+            streak["current_count"] += 1
+        else:
+            streak["current_count"] = 1
+            streak["started_at"] = log_date
+    
+    metadata["last_active_year"] = current_year
+    
+    if streak["current_count"] > streak["best_count"]:
+        streak["best_count"] = streak["current_count"]
+    
+    streak["last_updated"] = log_date
     
+    return streak
+
+
+def streak_cutoffs(today: date) -> dict:
+    """Per streak type, what a streak needs to have reached to still be live
+
+    A live daily, monthly or yearly streak was last updated on or after its
+    cutoff date; a live weekly streak last counted the cutoff ISO week (last
+    week) or later. Anything older can only restart from 1.
+    """
+    iso_year, iso_week, _ = (today - timedelta(days=7)).isocalendar()
+    return {
+        "daily": today - timedelta(days=1),
+        "weekly": f"{iso_year}-W{iso_week:02d}",
+        "monthly": activity.previous_month_bounds(today)[0],
+        "yearly": date(today.year - 1, 1, 1),
+    }
+
+
+def expire_broken_streaks(streaks: dict, today: date) -> dict:
+    """Zero the current count of streaks past their cutoff (as expire_streaks
+    does in bulk)"""
+    cutoffs = streak_cutoffs(today)
+    for streak_type, streak in streaks.items():
+        if streak_type == "weekly":
+            broken = streak["streak_metadata"].get("last_active_week", "") < cutoffs["weekly"]
+        else:
+            broken = streak["last_updated"] is not None and streak["last_updated"] < cutoffs[streak_type]
+        if broken:
+            streak["current_count"] = 0
+    return streaks
+
+
+def milestone_for_streak(daily_streak: int) -> tuple | None:
+    """Milestone config reached by this daily streak count, if any"""
+    for config in MILESTONE_CONFIGS:
+        if daily_streak == config[0]:
+            return config
     return None
+
+
+def upsert_streaks_stmt(user_id, streaks: dict):
+    """INSERT ... ON CONFLICT DO UPDATE writing all streak rows in one statement"""
+    return upsert_streak_rows_stmt().values(streak_rows(user_id, streaks))
+
+
+def streak_rows(user_id, streaks: dict) -> list[dict]:
+    return [
+        {"user_id": user_id, "streak_type": streak_type, **state}
+        for streak_type, state in streaks.items()
+    ]
+
+
+def upsert_streak_rows_stmt():
+    """The streak upsert without values, for executemany over streak_rows()"""
+    stmt = insert(Streak)
+    return stmt.on_conflict_do_update(
+        constraint="unique_user_streak_type",
+        set_={
+            field: stmt.excluded[field]
+            for field in STREAK_STATE_FIELDS if field != "id"
+        }
+    )
+
+
+def award_milestone_stmt(user_id, milestone: tuple):
+    """INSERT the badge unless the user already has it"""
+    return award_milestones_stmt().values(**milestone_row(user_id, milestone))
+
+
+def award_milestones_stmt():
+    """award_milestone_stmt without values, for executemany over milestone_row()"""
+    return insert(Milestone).on_conflict_do_nothing(index_elements=[Milestone.user_id, Milestone.badge_name])
+
+
+def milestone_row(user_id, milestone: tuple) -> dict:
+    _, badge_name, badge_type, description = milestone
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "badge_name": badge_name,
+        "badge_type": badge_type,
+        "description": description,
+    }
@@ -0,0 +1,198 @@
+import time
+from bisect import bisect_left, insort
+from datetime import date
+from sqlalchemy import select
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.models.streak import Streak
+from app.services.activity import week_bounds, month_start
+
+
+class RankedIndex:
+    """User ids kept sorted by a tuple of entry fields, highest first
+
+    Ranks and pages are read from a sorted list of keys with bisect, so
+    lookups are O(log n).
+    """
+
+    def __init__(self, fields: tuple[str, ...]):
+        self.fields = fields
+        self._keys: list[tuple] = []
+        self._by_user: dict[str, tuple] = {}
+
+    def _key(self, user_id: str, entry: dict) -> tuple:
+        return (*(-entry[field] for field in self.fields), user_id)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def discard(self, user_id: str):
+        key = self._by_user.pop(user_id, None)
+        if key:
+            del self._keys[bisect_left(self._keys, key)]
+
+    def upsert(self, user_id: str, entry: dict):
+        self.discard(user_id)
+        key = self._key(user_id, entry)
+        insort(self._keys, key)
+        self._by_user[user_id] = key
+
+    def rank(self, user_id: str) -> int | None:
+        key = self._by_user.get(user_id)
+        return bisect_left(self._keys, key) + 1 if key else None
+
+    def user_ids(self, offset: int, limit: int) -> list[str]:
+        return [key[-1] for key in self._keys[offset:offset + limit]]
+
+    def load(self, entries: dict[str, dict]):
+        self._by_user = {user_id: self._key(user_id, entry) for user_id, entry in entries.items()}
+        self._keys = sorted(self._by_user.values())
+
+
+class Leaderboards:
+    """All public users' scores, ranked several ways
+
+    Boards: daily_streak, week (points this ISO week), month (points this
+    month), all_time (total points) and level. Window scores come from the
+    users.week_points/month_points aggregates; when a window rolls over,
+    scores from the old window count as zero.
+    """
+
+    BOARDS = {
+        "daily_streak": ("daily_streak", "total_points"),
+        "week": ("week_points",),
+        "month": ("month_points",),
+        "all_time": ("total_points",),
+        "level": ("level", "total_points"),
+    }
+
+    def __init__(self):
+        self._entries: dict[str, dict] = {}
+        self._boards = {name: RankedIndex(fields) for name, fields in self.BOARDS.items()}
+        self._touched: dict[str, float] = {}
+        self.week_start = week_bounds(date.today())[0]
+        self.month_start = month_start(date.today())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _in_window(self, entry: dict) -> dict:
+        """Entry with window scores zeroed if they belong to an older window"""
+        if entry["week_start"] != self.week_start:
+            entry = {**entry, "week_points": 0, "week_start": self.week_start}
+        if entry["month_start"] != self.month_start:
+            entry = {**entry, "month_points": 0, "month_start": self.month_start}
+        return entry
+
+    def _roll_windows(self):
+        week, month = week_bounds(date.today())[0], month_start(date.today())
+        if (week, month) != (self.week_start, self.month_start):
+            self.week_start, self.month_start = week, month
+            self._entries = {user_id: self._in_window(entry) for user_id, entry in self._entries.items()}
+            self._boards["week"].load(self._entries)
+            self._boards["month"].load(self._entries)
+
+    def upsert(self, user_id, entry: dict):
+        user_id = str(user_id)
+        self._roll_windows()
+        entry = self._in_window(entry)
+        self._entries[user_id] = entry
+        for board in self._boards.values():
+            board.upsert(user_id, entry)
+        self._touched[user_id] = time.monotonic()
+
+    def remove(self, user_id):
+        user_id = str(user_id)
+        self._entries.pop(user_id, None)
+        for board in self._boards.values():
+            board.discard(user_id)
+        self._touched[user_id] = time.monotonic()
+
+    def get(self, user_id) -> dict | None:
+        return self._entries.get(str(user_id))
+
+    def ranks(self, user_id) -> dict[str, int | None]:
+        self._roll_windows()
+        return {name: board.rank(str(user_id)) for name, board in self._boards.items()}
+
+    def page(self, board: str, offset: int, limit: int) -> list[dict]:
+        self._roll_windows()
+        return [
+            {"rank": offset + i + 1, **public_fields(self._entries[user_id])}
+            for i, user_id in enumerate(self._boards[board].user_ids(offset, limit))
+        ]
+
+    def replace_all(self, entries: dict, loaded_at: float):
+        """Swap in a fresh snapshot, keeping any entry changed after loaded_at"""
+        self._roll_windows()
+        fresh = {str(user_id): self._in_window(entry) for user_id, entry in entries.items()}
+        for user_id, touched_at in self._touched.items():
+            if touched_at > loaded_at:
+                if user_id in self._entries:
+                    fresh[user_id] = self._entries[user_id]
+                else:
+                    fresh.pop(user_id, None)
+
+        self._entries = fresh
+        for board in self._boards.values():
+            board.load(fresh)
+        self._touched = {}
+
+
+leaderboards = Leaderboards()
+
+
+def leaderboard_entry(username: str, total_points: int, level: int, daily_streak: int,
+                      week_start: date, week_points: int, month_start: date, month_points: int) -> dict:
+    return {
+        "username": username,
+        "total_points": total_points or 0,
+        "level": level or 1,
+        "daily_streak": daily_streak or 0,
+        "week_start": week_start,
+        "week_points": week_points or 0,
+        "month_start": month_start,
+        "month_points": month_points or 0,
+    }
+
+
+def user_leaderboard_entry(user: User, daily_streak: int) -> dict:
+    return leaderboard_entry(
+        user.username, user.total_points, user.current_level, daily_streak,
+        user.week_start, user.week_points, user.month_start, user.month_points
+    )
+
+
+def public_fields(entry: dict) -> dict:
+    """Entry as shown on a board (window start dates are bookkeeping)"""
+    return {key: value for key, value in entry.items() if key not in ("week_start", "month_start")}
+
+
+async def rebuild_leaderboard():
+    """Reload every board from the database"""
+    loaded_at = time.monotonic()
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(
+            User.id,
+            User.username,
+            User.total_points,
+            User.current_level,
+            User.week_start,
+            User.week_points,
+            User.month_start,
+            User.month_points,
+            Streak.current_count
+        ).outerjoin(
+            Streak, (Streak.user_id == User.id) & (Streak.streak_type == "daily")
+        ).where(User.is_public == True))).all()
+
+    leaderboards.replace_all(
+        {
+            row.id: leaderboard_entry(
+                row.username, row.total_points, row.current_level, row.current_count,
+                row.week_start, row.week_points, row.month_start, row.month_points
+            )
+            for row in rows
+        },
+        loaded_at
+    )
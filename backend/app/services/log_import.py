@@ -0,0 +1,268 @@
+"""
+Bulk log import (POST /logs/import)
+
+Reads the CSV, JSON or NDJSON the export endpoints produce, optionally
+gzip-compressed, from the request body as it arrives. Each record is
+validated with the LogCreate rules and written with COPY in batches of
+LOG_IMPORT_BATCH_SIZE, so memory stays bounded by a batch rather than
+the file.
+
+The batches go to a temporary table, which isn't WAL-logged, and reach
+logs in one INSERT ... SELECT at the end. That is when the user row is
+locked to number them with a change_seq (see /logs/changes), so a slow
+upload doesn't hold up the user's other writes, and each log is written
+to logs just once. Streaks, points and milestones are left to one
+recompute afterwards (see recompute).
+"""
+import codecs
+import csv
+import json
+import re
+import uuid
+import zlib
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterator, Optional
+from pydantic import ValidationError
+from sqlalchemy import update, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models.user import User
+from app.schemas.log import LogCreate
+from app.services.game_logic import EFFORT_POINTS, calculate_points, get_tree_emoji_for_level
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+}
+
+LOG_COLUMNS = "id, user_id, task_text, effort_level, points_earned, tree_emoji, logged_at, date"
+# Holds the upload until it has all been read; dropped at commit
+CREATE_STAGING = text(
+    f"CREATE TEMP TABLE log_import_rows ON COMMIT DROP AS SELECT {LOG_COLUMNS} FROM logs WITH NO DATA"
+)
+# Binary COPY with declared types skips per-value type guessing and text
+# escaping on the client
+COPY_LOGS = f"COPY log_import_rows ({LOG_COLUMNS}) FROM STDIN (FORMAT BINARY)"
+COPY_TYPES = ["uuid", "uuid", "text", "text", "int4", "text", "timestamptz", "date"]
+INSERT_STAGED = text(
+    f"INSERT INTO logs ({LOG_COLUMNS}, change_seq) SELECT {LOG_COLUMNS}, :change_seq FROM log_import_rows"
+)
+
+LOGS_ARRAY = re.compile(r'"logs"\s*:\s*\[')
+# Longest stretch of JSON we'll hold while waiting for a record to complete
+MAX_PENDING_JSON = 64 * 1024
+
+
+class ImportFormatError(ValueError):
+    """The upload can't be imported; the message says why (and where)"""
+
+
+def format_for(content_type: Optional[str]) -> Optional[str]:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPES.get(media_type)
+
+
+async def _text(chunks: AsyncIterator[bytes], gzipped: bool) -> AsyncIterator[str]:
+    """Decode the body incrementally (inflating it first if gzipped)"""
+    inflate = zlib.decompressobj(wbits=31) if gzipped else None
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        async for chunk in chunks:
+            if inflate:
+                chunk = inflate.decompress(chunk)
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        yield decoder.decode(inflate.flush() if inflate else b"", final=True)
+    except (zlib.error, UnicodeDecodeError) as exc:
+        raise ImportFormatError(f"Could not decode upload: {exc}")
+
+
+async def _lines(text: AsyncIterator[str]) -> AsyncIterator[str]:
+    pending = ""
+    async for chunk in text:
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.removesuffix("\r")
+    if pending:
+        yield pending.removesuffix("\r")
+
+
+async def _csv_records(text: AsyncIterator[str]) -> AsyncIterator[dict]:
+    columns = None
+    record = ""
+    async for line in _lines(text):
+        # A quoted field may span lines; wait until the quotes balance
+        record = record + "\n" + line if record else line
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not values:
+            continue
+        if columns is None:
+            columns = [value.strip().lower() for value in values]
+            missing = {"date", "task", "effort"} - set(columns)
+            if missing:
+                raise ImportFormatError(f"CSV header is missing {', '.join(sorted(missing))}")
+            continue
+        yield dict(zip(columns, values))
+    if record:
+        raise ImportFormatError("CSV ends inside a quoted field")
+
+
+async def _json_records(text: AsyncIterator[str]) -> AsyncIterator[dict]:
+    """Objects from the "logs" array of a JSON export, parsed as they arrive"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = None  # inside the array once set
+    async for chunk in text:
+        buffer += chunk
+        if position is None:
+            match = LOGS_ARRAY.search(buffer)
+            if not match:
+                if len(buffer) > MAX_PENDING_JSON:
+                    raise ImportFormatError('JSON has no "logs" array')
+                continue
+            position = match.end()
+
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                return
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Probably cut off mid-object; wait for more
+                if len(buffer) - position > MAX_PENDING_JSON:
+                    raise ImportFormatError('Malformed JSON in the "logs" array')
+                break
+            yield record
+        buffer, position = buffer[position:], 0
+
+    raise ImportFormatError('JSON ends before the "logs" array is closed')
+
+
+async def _ndjson_records(text: AsyncIterator[str]) -> AsyncIterator[dict]:
+    async for line in _lines(text):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            raise ImportFormatError("Malformed NDJSON line")
+        if isinstance(record, dict) and record.get("type", "log") != "log":
+            continue  # the export header
+        yield record
+
+
+PARSERS = {"csv": _csv_records, "json": _json_records, "ndjson": _ndjson_records}
+
+
+def log_row(record: dict, user_id: uuid.UUID, today: date, now: datetime) -> tuple:
+    """COPY row for one exported log record; raises ValueError if invalid"""
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+    try:
+        log = LogCreate(
+            task_text=record.get("task"),
+            effort_level=str(record.get("effort") or "").strip().lower()
+        )
+    except ValidationError as exc:
+        error = exc.errors()[0]
+        raise ValueError(f"{error['loc'][0]}: {error['msg']}")
+
+    log_date = date.fromisoformat(str(record.get("date") or ""))
+    if log_date > today:
+        raise ValueError("date is in the future")
+
+    points = record.get("points")
+    if points in (None, ""):
+        points = calculate_points(log.effort_level)
+    else:
+        points = int(points)
+        low, high = EFFORT_POINTS[log.effort_level]
+        if not low <= points <= high:
+            raise ValueError(f"points must be between {low} and {high} for {log.effort_level}")
+
+    tree = record.get("tree") or get_tree_emoji_for_level(1)
+    if len(tree) > 10:
+        raise ValueError("tree is too long")
+
+    logged_at = record.get("logged_at")
+    if logged_at:
+        logged_at = datetime.fromisoformat(logged_at)
+        if logged_at.tzinfo is None:
+            logged_at = logged_at.replace(tzinfo=timezone.utc)
+        if logged_at > now:
+            raise ValueError("logged_at is in the future")
+        # date is the server's local day, so an export's UTC logged_at can
+        # fall on the day before or after it
+        if abs(logged_at.date() - log_date) > timedelta(days=1):
+            raise ValueError("logged_at is more than a day from date")
+    else:
+        logged_at = datetime.combine(log_date, time(12), tzinfo=timezone.utc)
+
+    return (uuid.uuid4(), user_id, log.task_text, log.effort_level, points, tree, logged_at, log_date)
+
+
+async def _copy(db: AsyncSession, rows: list[tuple]):
+    connection = await db.connection()
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+    async with driver_connection.cursor() as cursor:
+        async with cursor.copy(COPY_LOGS) as copy:
+            copy.set_types(COPY_TYPES)
+            for row in rows:
+                await copy.write_row(row)
+
+
+async def import_logs(db: AsyncSession, user_id: uuid.UUID, format: str,
+                      chunks: AsyncIterator[bytes], gzipped: bool = False) -> int:
+    """Import every record in the upload into logs; returns the row count
+
+    All or nothing: the first invalid record raises ImportFormatError and
+    the caller rolls back. The caller commits.
+
+    The imported logs share one change_seq, taken at the end under the
+    user row lock that then stays held until commit, so no concurrent write
+    can overtake it (see /logs/changes).
+    """
+    today = date.today()
+    now = datetime.now(timezone.utc)
+    await db.execute(CREATE_STAGING)
+    batch = []
+    imported = 0
+    number = 0
+    async for record in PARSERS[format](_text(chunks, gzipped)):
+        number += 1
+        if number > settings.LOG_IMPORT_MAX_ROWS:
+            raise ImportFormatError(f"Too many logs; the limit is {settings.LOG_IMPORT_MAX_ROWS}")
+        try:
+            batch.append(log_row(record, user_id, today, now))
+        except (ValueError, TypeError) as exc:
+            raise ImportFormatError(f"Log {number}: {exc}")
+        if len(batch) >= settings.LOG_IMPORT_BATCH_SIZE:
+            await _copy(db, batch)
+            imported += len(batch)
+            batch = []
+
+    if batch:
+        await _copy(db, batch)
+        imported += len(batch)
+
+    change_seq = await db.scalar(
+        update(User).where(User.id == user_id)
+        .values(change_seq=User.change_seq + 1)
+        .returning(User.change_seq)
+    )
+    await db.execute(INSERT_STAGED, {"change_seq": change_seq})
+    if imported >= settings.LOG_IMPORT_BATCH_SIZE:
+        # Autovacuum hasn't seen these rows yet; without fresh statistics the
+        # recompute's rollup queries can be planned as if the user had none
+        await db.execute(text("ANALYZE logs"))
+    return imported
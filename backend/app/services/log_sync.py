@@ -0,0 +1,55 @@
+"""
+Change tracking for GET /logs/changes
+
+Every write to a user's logs takes the next users.change_seq under the
+user row lock: created (and imported) logs carry it in logs.change_seq,
+deleted ones leave a log_tombstones row with it. A client's sync token is
+the change_seq it has seen up to, so its changes are the logs and
+tombstones above that number.
+
+Tombstones are pruned after LOG_TOMBSTONE_RETENTION_DAYS. Pruning raises
+users.sync_floor to the newest pruned sequence, and tokens below the
+floor are answered with a full reload instead of a delta that would miss
+deletions.
+"""
+from datetime import timedelta
+from sqlalchemy import select, delete, update, func, text
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.models.log_tombstone import LogTombstone
+
+PRUNE_BATCH_SIZE = 5000
+# Held for each batch, so only one process prunes at a time
+PRUNE_LOCK_ID = 7301
+
+
+async def prune_tombstones():
+    """Delete expired tombstones in batches, raising each owner's sync_floor"""
+    while True:
+        async with AsyncSessionLocal() as db:
+            locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": PRUNE_LOCK_ID})
+            if not locked:
+                return
+            batch = (
+                select(LogTombstone.log_id)
+                .where(LogTombstone.deleted_at < func.now() - timedelta(days=settings.LOG_TOMBSTONE_RETENTION_DAYS))
+                .order_by(LogTombstone.deleted_at)
+                .limit(PRUNE_BATCH_SIZE)
+            )
+            pruned = delete(LogTombstone).where(LogTombstone.log_id.in_(batch)).returning(
+                LogTombstone.user_id, LogTombstone.change_seq
+            ).cte("pruned")
+            floors = select(
+                pruned.c.user_id, func.max(pruned.c.change_seq).label("change_seq")
+            ).group_by(pruned.c.user_id).subquery()
+            # Not user activity: keep last_active_at from its onupdate
+            raised = update(User).where(User.id == floors.c.user_id).values(
+                sync_floor=func.greatest(User.sync_floor, floors.c.change_seq),
+                last_active_at=User.last_active_at
+            ).returning(User.id).cte("raised")
+
+            count = await db.scalar(select(func.count()).select_from(pruned).add_cte(raised))
+            await db.commit()
+        if count < PRUNE_BATCH_SIZE:
+            return
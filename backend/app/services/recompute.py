@@ -0,0 +1,266 @@
+"""
+Recompute a user's derived stats from their logs
+
+create_log updates points, level, the activity bitmap, streaks and
+milestones incrementally, one log at a time. After a bulk change (a log
+import) or a deletion they are rebuilt from the full history instead:
+the user's active days, as sorted date ordinals, go through one NumPy
+pass per streak rule, which leaves every value exactly where create_log
+would have left it had each log been written on its day (the tests check
+it against a one-day-at-a-time replay). Streaks broken since are then
+zeroed, as the periodic expiry would.
+
+Run as a module to repair every user, sharded across processes:
+
+    python -m app.services.recompute --workers 4
+"""
+import argparse
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from typing import NamedTuple
+import numpy as np
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import engine, SessionLocal
+from app.models.user import User
+from app.models.milestone import Milestone
+from app.models.daily_activity import DailyActivity
+from app.services import activity, rollups
+from app.services.game_logic import (
+    LOG_STREAK_TYPES,
+    MILESTONE_CONFIGS,
+    calculate_level,
+    new_streak_state,
+    expire_broken_streaks,
+    upsert_streaks_stmt,
+    upsert_streak_rows_stmt,
+    streak_rows,
+    award_milestone_stmt,
+    award_milestones_stmt,
+    milestone_row
+)
+
+logger = logging.getLogger(__name__)
+
+# Users per repair transaction
+REPAIR_BATCH_SIZE = 1000
+
+
+class RecomputeResult(NamedTuple):
+    user_values: dict  # users columns as written
+    daily_streak: int
+    milestones_earned: list[str]  # newly awarded
+
+
+def _runs(units: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Lengths and start positions of the runs of consecutive values in
+    sorted, distinct units"""
+    starts = np.flatnonzero(np.diff(units) != 1) + 1
+    starts = np.concatenate(([0], starts))
+    return np.diff(np.append(starts, len(units))), starts
+
+
+def _as_date(value) -> date:
+    return value.astype("datetime64[D]").item()
+
+
+def compute_streaks(days: np.ndarray) -> dict:
+    """Streak rows for activity on days (sorted, distinct datetime64[D]),
+    as create_log would leave them after logging on each day in turn"""
+    streaks = {streak_type: new_streak_state() for streak_type in LOG_STREAK_TYPES}
+    if not len(days):
+        return streaks
+    last_day = _as_date(days[-1])
+    for streak in streaks.values():
+        streak["last_updated"] = last_day
+
+    # Daily: runs of consecutive days
+    lengths, starts = _runs(days.astype(np.int64))
+    streaks["daily"].update(
+        current_count=int(lengths[-1]), best_count=int(lengths.max()), started_at=_as_date(days[starts[-1]])
+    )
+
+    # Weekly: runs of consecutive Monday-based weeks with 5+ active days
+    # (day 0, 1970-01-01, was a Thursday)
+    weeks, active_days = np.unique((days.astype(np.int64) + 3) // 7, return_counts=True)
+    iso_year, iso_week, _ = last_day.isocalendar()
+    metadata = {"current_week": f"{iso_year}-W{iso_week:02d}", "days_active_this_week": int(active_days[-1])}
+    counted = weeks[active_days >= 5]
+    if len(counted):
+        lengths, starts = _runs(counted)
+        iso_year, iso_week, _ = _as_date(np.datetime64(int(counted[-1]) * 7 - 3, "D")).isocalendar()
+        metadata["last_active_week"] = f"{iso_year}-W{iso_week:02d}"
+        streaks["weekly"].update(
+            current_count=int(lengths[-1]),
+            best_count=int(lengths.max()),
+            started_at=_as_date(np.datetime64(int(counted[starts[-1]]) * 7 - 3, "D"))
+        )
+    streaks["weekly"]["streak_metadata"] = metadata
+
+    # Monthly and yearly: runs of consecutive periods with any activity,
+    # started on the first active day of the run's first period
+    for streak_type, unit, label in (("monthly", "M", "last_active_month"), ("yearly", "Y", "last_active_year")):
+        periods, first_days = np.unique(days.astype(f"datetime64[{unit}]").astype(np.int64), return_index=True)
+        lengths, starts = _runs(periods)
+        streaks[streak_type].update(
+            current_count=int(lengths[-1]),
+            best_count=int(lengths.max()),
+            started_at=_as_date(days[first_days[starts[-1]]]),
+            streak_metadata={label: str(days[-1].astype(f"datetime64[{unit}]"))}
+        )
+    return streaks
+
+
+def compute_user_values(days: np.ndarray, points: np.ndarray, epoch: date, today: date) -> dict:
+    """users columns for per-day points on days (sorted, distinct datetime64[D])"""
+    if len(days):
+        epoch = min(epoch, _as_date(days[0]))
+    offsets = (days - np.datetime64(epoch, "D")).astype(np.int64)
+    bits = np.zeros(offsets[-1] + 1 if len(offsets) else 0, dtype=bool)
+    bits[offsets] = True
+
+    total_points = int(points.sum())
+    week_start = activity.week_bounds(today)[0]
+    month_start = activity.month_start(today)
+    return {
+        "total_points": total_points,
+        "current_level": calculate_level(total_points),
+        "last_log_date": _as_date(days[-1]) if len(days) else None,
+        "activity_epoch": epoch,
+        "activity_bitmap": np.packbits(bits, bitorder="little").tobytes(),
+        "week_start": week_start,
+        "week_points": int(points[days >= np.datetime64(week_start, "D")].sum()),
+        "month_start": month_start,
+        "month_points": int(points[days >= np.datetime64(month_start, "D")].sum()),
+    }
+
+
+def _milestones_for(streaks: dict) -> list[tuple]:
+    best_daily = streaks["daily"]["best_count"]
+    return [milestone for milestone in MILESTONE_CONFIGS if best_daily >= milestone[0]]
+
+
+async def recompute_user(db: AsyncSession, user_id, rebuild_rollup: bool = True) -> RecomputeResult:
+    """Recompute the user's stats, streaks and milestones from their rollup
+
+    The rollup itself is rebuilt from logs first unless the caller kept it
+    current (delete_log does). Locks the user row; the caller commits.
+    """
+    epoch = await db.scalar(
+        select(User.activity_epoch).where(User.id == user_id).with_for_update()
+    )
+    if rebuild_rollup:
+        for stmt in rollups.rebuild_users_stmts([user_id]):
+            await db.execute(stmt)
+    rows = (await db.execute(
+        select(DailyActivity.date, DailyActivity.points)
+        .where(DailyActivity.user_id == user_id, DailyActivity.log_count > 0)
+        .order_by(DailyActivity.date)
+    )).all()
+
+    today = date.today()
+    days = np.array([day for day, _ in rows], dtype="datetime64[D]")
+    points = np.array([points for _, points in rows], dtype=np.int64)
+    user_values = compute_user_values(days, points, epoch, today)
+    streaks = expire_broken_streaks(compute_streaks(days), today)
+
+    await db.execute(
+        update(User).where(User.id == user_id).values(**user_values, data_version=User.data_version + 1)
+    )
+    await db.execute(upsert_streaks_stmt(user_id, streaks))
+
+    milestones_earned = []
+    for milestone in _milestones_for(streaks):
+        badge = await db.scalar(award_milestone_stmt(user_id, milestone).returning(Milestone.badge_name))
+        if badge:
+            milestones_earned.append(badge)
+
+    return RecomputeResult(user_values, streaks["daily"]["current_count"], milestones_earned)
+
+
+def repair_users(user_ids: list) -> tuple[int, int]:
+    """Recompute a batch of users in one transaction (sync engine, for the
+    CLI); returns (users, active days) processed"""
+    users = User.__table__
+    today = date.today()
+    with SessionLocal() as db, db.begin():
+        # Lock in id order, as recompute_user does, before touching rollups
+        epochs = dict(db.execute(
+            select(User.id, User.activity_epoch).where(User.id.in_(user_ids)).order_by(User.id).with_for_update()
+        ).all())
+        for stmt in rollups.rebuild_users_stmts(user_ids):
+            db.execute(stmt)
+        rows = db.execute(
+            select(DailyActivity.user_id, DailyActivity.date, DailyActivity.points)
+            .where(DailyActivity.user_id.in_(user_ids), DailyActivity.log_count > 0)
+            .order_by(DailyActivity.user_id, DailyActivity.date)
+        ).all()
+
+        by_user = {user_id: [] for user_id in epochs}
+        for user_id, user_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            by_user[user_id] = list(user_rows)
+
+        user_params, streak_params, milestone_params = [], [], []
+        for user_id, user_rows in by_user.items():
+            days = np.array([row[1] for row in user_rows], dtype="datetime64[D]")
+            points = np.array([row[2] for row in user_rows], dtype=np.int64)
+            streaks = expire_broken_streaks(compute_streaks(days), today)
+            user_params.append({"b_id": user_id, **compute_user_values(days, points, epochs[user_id], today)})
+            streak_params.extend(streak_rows(user_id, streaks))
+            milestone_params.extend(milestone_row(user_id, milestone) for milestone in _milestones_for(streaks))
+
+        # Core executemany: batched multi-row statements, not the ORM's
+        # per-row bulk path
+        conn = db.connection()
+        if user_params:
+            # A repair isn't user activity: keep last_active_at from its onupdate
+            conn.execute(
+                update(users).where(users.c.id == bindparam("b_id")).values(
+                    data_version=users.c.data_version + 1, last_active_at=users.c.last_active_at
+                ),
+                user_params
+            )
+            conn.execute(upsert_streak_rows_stmt(), streak_params)
+        if milestone_params:
+            conn.execute(award_milestones_stmt(), milestone_params)
+    return len(user_params), len(rows)
+
+
+def _init_worker():
+    # Connections inherited from the parent belong to it
+    engine.dispose(close=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute every user's stats, streaks and milestones from their logs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=REPAIR_BATCH_SIZE, help="users per transaction")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    with engine.connect() as conn:
+        user_ids = conn.scalars(select(User.id).order_by(User.id)).all()
+    engine.dispose()
+    batches = [user_ids[start:start + args.batch_size] for start in range(0, len(user_ids), args.batch_size)]
+
+    started = time.perf_counter()
+    users = days = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        for future in as_completed([pool.submit(repair_users, batch) for batch in batches]):
+            batch_users, batch_days = future.result()
+            users += batch_users
+            days += batch_days
+            logger.info("%d/%d users (%d active days) in %.1fs", users, len(user_ids), days,
+                        time.perf_counter() - started)
+    # Running API processes pick the new values up on their next
+    # leaderboard refresh and user cache expiry
+
+
+if __name__ == "__main__":
+    # Through the package, so workers unpickle app.services.recompute.repair_users
+    from app.services.recompute import main
+    main()
@@ -0,0 +1,77 @@
+from datetime import date
+from sqlalchemy import select, update, delete, case, func, exists, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from app.models.daily_activity import DailyActivity
+from app.models.log import Log
+
+EFFORT_COLUMNS = {
+    "seed": "seed_count",
+    "sapling": "sapling_count",
+    "oak": "oak_count",
+}
+
+
+def add_log_stmt(user_id, log_date: date, points: int, effort_level: str):
+    """Upsert that folds one new log into the user's daily_activity row"""
+    values = {
+        "user_id": user_id,
+        "date": log_date,
+        "points": points,
+        "log_count": 1,
+        **{column: int(effort == effort_level) for effort, column in EFFORT_COLUMNS.items()},
+    }
+    stmt = insert(DailyActivity).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyActivity.user_id, DailyActivity.date],
+        set_={
+            column: getattr(DailyActivity, column) + stmt.excluded[column]
+            for column in ("points", "log_count", *EFFORT_COLUMNS.values())
+        }
+    )
+
+
+def remove_log_stmt(user_id, deleted_log):
+    """UPDATE that subtracts a deleted log (a CTE/table with date, points_earned
+    and effort_level columns) from the user's daily_activity row"""
+    return update(DailyActivity).where(
+        DailyActivity.user_id == user_id,
+        DailyActivity.date == deleted_log.c.date
+    ).values(
+        points=DailyActivity.points - deleted_log.c.points_earned,
+        log_count=DailyActivity.log_count - 1,
+        **{
+            column: getattr(DailyActivity, column) - case(
+                (deleted_log.c.effort_level == effort, 1), else_=0
+            )
+            for effort, column in EFFORT_COLUMNS.items()
+        }
+    )
+
+
+def rebuild_users_stmts(user_ids: list) -> list:
+    """Statements that rebuild these users' daily_activity rows from their
+    logs: an upsert of every day with logs, then a delete of days left
+    without any"""
+    columns = ["user_id", "date", "points", "log_count", *EFFORT_COLUMNS.values()]
+    per_day = select(
+        Log.user_id,
+        Log.date,
+        func.sum(Log.points_earned),
+        func.count(),
+        *(func.count().filter(Log.effort_level == effort) for effort in EFFORT_COLUMNS)
+    ).where(Log.user_id.in_(user_ids)).group_by(Log.user_id, Log.date)
+
+    upsert = insert(DailyActivity).from_select(columns, per_day)
+    # Rows that are already right are left alone rather than rewritten
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[DailyActivity.user_id, DailyActivity.date],
+        set_={column: upsert.excluded[column] for column in columns[2:]},
+        where=tuple_(*(getattr(DailyActivity, column) for column in columns[2:])).is_distinct_from(
+            tuple_(*(upsert.excluded[column] for column in columns[2:]))
+        )
+    )
+    prune = delete(DailyActivity).where(
+        DailyActivity.user_id.in_(user_ids),
+        ~exists().where(Log.user_id == DailyActivity.user_id, Log.date == DailyActivity.date)
+    )
+    return [upsert, prune]
@@ -0,0 +1,93 @@
+"""
+Rendered public pages for GET /share/{token}
+
+A page only changes when its owner logs, deletes a log or edits their
+profile, so the serialized body is kept per token along with its ETag and
+dropped when the owner changes. The view count changes on every view, so
+it stays out of the cached body and the ETag: the route adds the live
+count when serving. Entries also expire after SHARE_CACHE_TTL_SECONDS,
+which bounds how stale other workers' views in that count and other
+workers' copies can get.
+"""
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple
+from app.config import settings
+from app.utils.http_cache import strong_etag
+
+
+class SharePage(NamedTuple):
+    share_id: uuid.UUID
+    user_id: uuid.UUID
+    body: bytes  # JSON object without view_count
+    etag: str  # weak: bodies served differ in view_count
+    view_count: int  # persisted + pending at render
+    views_recorded: int  # view_counter.recorded() at render
+
+
+class SharePageCache:
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._pages: OrderedDict[str, tuple[float, SharePage]] = OrderedDict()
+        self._tokens_by_user: dict[uuid.UUID, set[str]] = {}
+        self._invalidated: dict[uuid.UUID, float] = {}
+
+    def get(self, token: str) -> SharePage | None:
+        entry = self._pages.get(token)
+        if entry is None:
+            return None
+        rendered_at, page = entry
+        if time.monotonic() - rendered_at > self.ttl:
+            self._drop(token)
+            return None
+        self._pages.move_to_end(token)
+        return page
+
+    def put(self, token: str, share_id: uuid.UUID, user_id: uuid.UUID, body: bytes,
+            rendered_at: float, view_count: int, views_recorded: int) -> SharePage:
+        """Cache a page rendered from data read at rendered_at, unless its
+        owner changed since"""
+        page = SharePage(share_id, user_id, body, "W/" + strong_etag(body), view_count, views_recorded)
+        if self.ttl <= 0 or self.max_size <= 0 or self._invalidated.get(user_id, 0.0) >= rendered_at:
+            return page
+        self._drop(token)
+        self._pages[token] = (rendered_at, page)
+        self._tokens_by_user.setdefault(user_id, set()).add(token)
+        while len(self._pages) > self.max_size:
+            self._drop(next(iter(self._pages)))
+        return page
+
+    def _drop(self, token: str):
+        entry = self._pages.pop(token, None)
+        if entry:
+            tokens = self._tokens_by_user.get(entry[1].user_id)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[entry[1].user_id]
+
+    def invalidate_token(self, token: str):
+        self._drop(token)
+
+    def invalidate_user(self, user_id):
+        """Drop every page owned by a user after their data changed"""
+        self.invalidate_users([user_id])
+
+    def invalidate_users(self, user_ids):
+        now = time.monotonic()
+        for user_id in user_ids:
+            user_id = uuid.UUID(str(user_id))
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._drop(token)
+            self._invalidated[user_id] = now
+        if len(self._invalidated) > self.max_size:
+            # Only renders started within the last ttl can still be in flight
+            self._invalidated = {
+                key: invalidated_at for key, invalidated_at in self._invalidated.items()
+                if now - invalidated_at <= self.ttl
+            }
+
+
+share_page_cache = SharePageCache(settings.SHARE_CACHE_TTL_SECONDS, settings.SHARE_CACHE_MAX_SIZE)
@@ -0,0 +1,156 @@
+"""
+In-memory membership filter over active share tokens
+
+A counting Bloom filter answers "might this token exist?" with no false
+negatives for tokens it has been told about, so GET /share/{token} and
+likes can 404 guessed tokens without a query. Counters (rather than bits)
+let revoked tokens be removed.
+
+Each worker builds the filter at startup. Creating a link sends a
+Postgres NOTIFY with the token on commit, and every worker LISTENs on its
+own connection, so a link made on one worker is known to the others
+within moments rather than being a 404 there until the next poll. Polling
+for links created since the last look every SHARE_FILTER_REFRESH_SECONDS
+stays as the backstop for notifications missed while a listener is
+reconnecting. Links revoked by another worker stay as harmless false
+positives. Until the first build finishes, every token is treated as
+possibly present.
+"""
+import hashlib
+import math
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+from app.config import settings
+from app.database import AsyncSessionLocal, connect_listener
+from app.models.shared_forest import SharedForest
+
+# NOTIFY channel carrying "<token> <created_at isoformat>" for new links
+CHANNEL = "share_tokens"
+
+# Rows committed late can carry a created_at slightly older than the last
+# poll (now() is the transaction start), so each poll looks back this far
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+class CountingBloomFilter:
+    """Bloom filter with 8-bit saturating counters"""
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._counters = bytearray(self.size)
+        self.count = 0
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            if self._counters[position] < 255:
+                self._counters[position] += 1
+        self.count += 1
+
+    def remove(self, item: str):
+        """Remove an item previously added (removing anything else corrupts the filter)"""
+        for position in self._positions(item):
+            # A saturated counter has lost track of its count; leave it set
+            if 0 < self._counters[position] < 255:
+                self._counters[position] -= 1
+        self.count -= 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._counters[position] for position in self._positions(item))
+
+
+class ShareTokenFilter:
+    def __init__(self):
+        self._filter: CountingBloomFilter | None = None
+        self._watermark: datetime | None = None
+        # Tokens seen within REFRESH_OVERLAP of the watermark, so overlapping
+        # polls don't add them twice
+        self._recent: dict[str, datetime] = {}
+
+    def might_exist(self, token: str) -> bool:
+        """False only for tokens that are definitely not active"""
+        return self._filter is None or token in self._filter
+
+    def probably_taken(self, token: str) -> bool:
+        """True for tokens the filter knows (or thinks) are in use"""
+        return self._filter is not None and token in self._filter
+
+    def add(self, token: str, created_at: datetime):
+        if self._filter is None or token in self._recent:
+            return
+        self._filter.add(token)
+        self._recent[token] = created_at
+
+    def remove(self, token: str, created_at: datetime):
+        """Forget an active token that was just revoked"""
+        if self._filter is None:
+            return
+        # Only tokens this worker has added can be taken out again; a link
+        # created elsewhere since the last poll was never added
+        if token in self._recent or created_at <= self._watermark - REFRESH_OVERLAP:
+            self._filter.remove(token)
+
+    async def rebuild(self):
+        """Load every active token, sizing the filter for growth"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(SharedForest.share_token, SharedForest.created_at)
+                .where(SharedForest.is_active == True)
+            )).all()
+
+        capacity = max(2 * len(rows), settings.SHARE_FILTER_MIN_CAPACITY)
+        bloom = CountingBloomFilter(capacity, settings.SHARE_FILTER_FALSE_POSITIVE_RATE)
+        for token, _ in rows:
+            bloom.add(token)
+
+        latest = max((created_at for _, created_at in rows if created_at), default=None)
+        self._watermark = latest or datetime.now().astimezone()
+        self._recent = {token: created_at for token, created_at in rows
+                        if created_at and created_at > self._watermark - REFRESH_OVERLAP}
+        self._filter = bloom
+
+    async def listen(self):
+        """Add tokens as other workers announce them, until the connection
+        drops (run it with background.run_forever)"""
+        async with await connect_listener() as conn:
+            await conn.execute(f"LISTEN {CHANNEL}")
+            # Catch up on anything announced before LISTEN took effect
+            await self.refresh()
+            async for notify in conn.notifies():
+                token, created_at = notify.payload.split(" ", 1)
+                self.add(token, datetime.fromisoformat(created_at))
+
+    async def refresh(self):
+        """Add links created since the last poll; rebuild if over capacity"""
+        if self._filter is None or self._filter.count > self._filter.capacity:
+            await self.rebuild()
+            return
+
+        since = self._watermark - REFRESH_OVERLAP
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(SharedForest.share_token, SharedForest.created_at)
+                .where(SharedForest.created_at > since, SharedForest.is_active == True)
+            )).all()
+
+        for token, created_at in rows:
+            self.add(token, created_at)
+            self._watermark = max(self._watermark, created_at)
+        cutoff = self._watermark - REFRESH_OVERLAP
+        self._recent = {token: created_at for token, created_at in self._recent.items() if created_at > cutoff}
+
+
+def notify_stmt(token: str, created_at: datetime):
+    """Statement announcing a new link to every worker's filter once the
+    transaction commits"""
+    return select(func.pg_notify(CHANNEL, f"{token} {created_at.isoformat()}"))
+
+
+share_token_filter = ShareTokenFilter()
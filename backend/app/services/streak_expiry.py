@@ -0,0 +1,77 @@
+"""
+Periodic expiry of broken streaks
+
+create_log only touches a user's streaks when they log, so a streak broken
+by a missed day (or week, month, year) would keep showing its old
+current_count. Every STREAK_EXPIRY_SECONDS this job zeroes those counts
+with set-based UPDATEs, EXPIRY_BATCH_SIZE rows per transaction, so reads
+of streaks stay plain lookups. It only ever moves a count to 0, so it can
+run any number of times; an advisory lock keeps it to one process at a
+time.
+"""
+from datetime import date
+from sqlalchemy import select, update, and_, or_, func, text
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.models.streak import Streak
+from app.services.game_logic import streak_cutoffs
+from app.services.leaderboard import rebuild_leaderboard
+from app.services.share_cache import share_page_cache
+
+EXPIRY_BATCH_SIZE = 1000
+# Held for each batch, so only one process expires streaks at a time
+EXPIRY_LOCK_ID = 7302
+
+
+def broken_streaks(today: date):
+    """SQL filter for streaks past their cutoff (see expire_broken_streaks)"""
+    cutoffs = streak_cutoffs(today)
+    return and_(Streak.current_count > 0, or_(
+        and_(
+            Streak.streak_type == "weekly",
+            func.coalesce(Streak.streak_metadata["last_active_week"].astext, "") < cutoffs["weekly"]
+        ),
+        *(
+            and_(Streak.streak_type == streak_type, Streak.last_updated < cutoffs[streak_type])
+            for streak_type in ("daily", "monthly", "yearly")
+        )
+    ))
+
+
+async def expire_streaks():
+    """Zero every broken streak's current_count, a batch per transaction"""
+    today = date.today()
+    expired_users = set()
+    while True:
+        async with AsyncSessionLocal() as db:
+            locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": EXPIRY_LOCK_ID})
+            if not locked:
+                break
+            # Users in the middle of create_log hold their row lock; they're
+            # skipped here and picked up by the next run
+            batch = (
+                select(Streak.id)
+                .join(User, User.id == Streak.user_id)
+                .where(broken_streaks(today))
+                .limit(EXPIRY_BATCH_SIZE)
+                .with_for_update(of=[Streak, User], skip_locked=True)
+            )
+            expired = update(Streak).where(Streak.id.in_(batch)).values(current_count=0).returning(
+                Streak.user_id
+            ).cte("expired")
+            # Exports include streaks; expiry isn't user activity, so
+            # last_active_at keeps its value rather than taking its onupdate
+            bumped_users = update(User).where(User.id.in_(select(expired.c.user_id))).values(
+                data_version=User.data_version + 1, last_active_at=User.last_active_at
+            ).cte("bumped_users")
+
+            user_ids = (await db.scalars(select(expired.c.user_id).add_cte(bumped_users))).all()
+            await db.commit()
+        expired_users.update(user_ids)
+        if len(user_ids) < EXPIRY_BATCH_SIZE:
+            break
+
+    if expired_users:
+        share_page_cache.invalidate_users(expired_users)
+        # Other processes catch up on their next scheduled refresh
+        await rebuild_leaderboard()
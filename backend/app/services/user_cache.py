@@ -0,0 +1,71 @@
+"""
+Process-local cache of authenticated users' rows
+
+get_current_user reads through this so read-only endpoints authenticate
+without a query. Writers in this process invalidate explicitly; the TTL
+bounds how stale another worker process can be.
+"""
+import time
+from collections import OrderedDict
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from app.config import settings
+from app.models.user import User
+
+USER_COLUMNS = tuple(attr.key for attr in inspect(User).column_attrs)
+
+
+class UserCache:
+    """Bounded LRU of user column values, each entry valid for ttl seconds"""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._invalidated: dict[str, float] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id) -> User | None:
+        """A fresh detached User built from the cached row, or None"""
+        user_id = str(user_id)
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        loaded_at, values = entry
+        if time.monotonic() - loaded_at > self.ttl:
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User, loaded_at: float):
+        """Cache a user read at loaded_at, unless it was invalidated since"""
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        user_id = str(user.id)
+        if self._invalidated.get(user_id, 0.0) >= loaded_at:
+            return
+        self._entries[user_id] = (loaded_at, {column: getattr(user, column) for column in USER_COLUMNS})
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop a user after a write; reads already in flight won't re-add it"""
+        user_id = str(user_id)
+        now = time.monotonic()
+        self._entries.pop(user_id, None)
+        self._invalidated[user_id] = now
+        if len(self._invalidated) > self.max_size:
+            # Only reads started within the last ttl can still be in flight
+            self._invalidated = {
+                key: invalidated_at for key, invalidated_at in self._invalidated.items()
+                if now - invalidated_at <= self.ttl
+            }
+
+
+user_cache = UserCache(settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_MAX_SIZE)
@@ -0,0 +1,70 @@
+"""
+Write-behind view counts for shared forests
+
+Public views are counted in memory and added to shared_forests.view_count
+in one batched UPDATE every VIEW_COUNT_FLUSH_SECONDS (and on shutdown), so
+a popular link doesn't turn its row into a write hot spot. Counts are per
+worker until flushed; readers add the pending delta to the stored value.
+"""
+import uuid
+from sqlalchemy import select, update, values, column, Integer
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import AsyncSessionLocal
+from app.models.shared_forest import SharedForest
+
+
+class ViewCounter:
+    def __init__(self):
+        self._pending: dict[uuid.UUID, int] = {}
+        # Deltas being written; still counted as pending until committed
+        self._flushing: dict[uuid.UUID, int] = {}
+        # Every view this process has counted, flushed or not
+        self._recorded: dict[uuid.UUID, int] = {}
+
+    def record(self, share_id: uuid.UUID):
+        self._pending[share_id] = self._pending.get(share_id, 0) + 1
+        self._recorded[share_id] = self._recorded.get(share_id, 0) + 1
+
+    def pending(self, share_id: uuid.UUID) -> int:
+        return self._pending.get(share_id, 0) + self._flushing.get(share_id, 0)
+
+    def recorded(self, share_id: uuid.UUID) -> int:
+        """Views counted here so far; only ever grows, unlike pending()"""
+        return self._recorded.get(share_id, 0)
+
+    async def flush(self):
+        """Add every pending delta to view_count in one transaction"""
+        if not self._pending or self._flushing:
+            return
+        self._flushing, self._pending = self._pending, {}
+
+        deltas = values(
+            column("id", UUID(as_uuid=True)), column("delta", Integer), name="deltas"
+        ).data(sorted(self._flushing.items()))
+        committed = False
+        try:
+            async with AsyncSessionLocal() as db:
+                # Lock rows in id order so workers flushing at once can't deadlock
+                await db.execute(
+                    select(SharedForest.id)
+                    .where(SharedForest.id.in_(select(deltas.c.id)))
+                    .order_by(SharedForest.id)
+                    .with_for_update()
+                )
+                await db.execute(
+                    update(SharedForest)
+                    .where(SharedForest.id == deltas.c.id)
+                    .values(view_count=SharedForest.view_count + deltas.c.delta)
+                )
+                await db.commit()
+            committed = True
+        finally:
+            # Keep the views for the next flush on any failure, including
+            # cancellation during the shutdown flush
+            if not committed:
+                for share_id, delta in self._flushing.items():
+                    self._pending[share_id] = self._pending.get(share_id, 0) + delta
+            self._flushing = {}
+
+
+view_counter = ViewCounter()
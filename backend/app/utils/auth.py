@@ -1,30 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import asyncio
+import time
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
+from app.services.user_cache import user_cache
 
 # JWT token bearer
 security = HTTPBearer()
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
+class PasswordHashPool:
+    """Bounded thread pool for bcrypt, which releases the GIL while hashing
+
+    Keeps the ~250 ms per hash off the event loop. Once workers + max_queue
+    calls are in flight, new ones are refused with a 503 rather than
+    queueing without bound behind a login storm.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, func, *args):
+        if self.pending >= self.workers + self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in attempts in progress, try again shortly",
+                headers={"Retry-After": "1"}
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+        
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hash_pool = PasswordHashPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+def _check_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
-def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    salt = bcrypt.gensalt()
+def _hash_password(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash"""
+    return await password_hash_pool.run(_check_password, plain_password, hashed_password)
+
+
+async def get_password_hash(password: str) -> str:
+    """Hash a password"""
+    return await password_hash_pool.run(_hash_password, password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether a stored hash was made with a different cost than BCRYPT_ROUNDS"""
+    # $2b$<cost>$<salt+hash>
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -50,13 +111,8 @@ def decode_token(token: str) -> dict:
         )
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token"""
-    token = credentials.credentials
-    payload = decode_token(token)
+def _user_id_from_token(credentials: HTTPAuthorizationCredentials) -> str:
+    payload = decode_token(credentials.credentials)
     
     user_id: str = payload.get("sub")
     if user_id is None:
@@ -64,12 +120,39 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
-    
-    user = db.query(User).filter(User.id == user_id).first()
+    return user_id
+
+
+async def _load_user(user_id: str, db: AsyncSession) -> User:
+    loaded_at = time.monotonic()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
     
+    user_cache.put(user, loaded_at)
     return user
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Get current authenticated user from JWT token
+
+    Served from the user cache when possible, in which case the instance is
+    detached from the session. Handlers that modify the user should depend
+    on get_current_user_for_update instead.
+    """
+    user_id = _user_id_from_token(credentials)
+    return user_cache.get(user_id) or await _load_user(user_id, db)
+
+
+async def get_current_user_for_update(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Get current authenticated user, loaded into the request's session"""
+    return await _load_user(_user_id_from_token(credentials), db)
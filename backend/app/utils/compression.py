@@ -0,0 +1,93 @@
+"""
+Content-Encoding negotiation and streaming compression for exports
+
+gzip is always available; zstd is offered when the optional zstandard
+package is installed. Each chunk is flushed as it is compressed so the
+stream stays incremental.
+"""
+import zlib
+from typing import AsyncIterator, Optional
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+# Preferred first when the client accepts several equally
+SUPPORTED_ENCODINGS = ("zstd", "gzip") if zstandard else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported encoding the client accepts, or None for identity"""
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    candidates = [
+        (weights.get(encoding, weights.get("*", 0.0)), -rank, encoding)
+        for rank, encoding in enumerate(SUPPORTED_ENCODINGS)
+    ]
+    quality, _, encoding = max(candidates)
+    return encoding if quality > 0 else None
+
+
+class _Identity:
+    def chunk(self, data: bytes) -> bytes:
+        return data
+
+    def end(self) -> bytes:
+        return b""
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def end(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def end(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def compressor_for(encoding: Optional[str]):
+    """Incremental compressor with chunk(bytes) -> bytes and end() -> bytes"""
+    if encoding == "zstd":
+        return _Zstd()
+    if encoding == "gzip":
+        return _Gzip()
+    return _Identity()
+
+
+async def compress_stream(chunks: AsyncIterator[str], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    """Encode text chunks as UTF-8, compressed with encoding if given"""
+    compressor = compressor_for(encoding)
+    async for chunk in chunks:
+        compressed = compressor.chunk(chunk.encode())
+        if compressed:
+            yield compressed
+    final = compressor.end()
+    if final:
+        yield final
@@ -0,0 +1,161 @@
+"""
+Local verification of Google ID tokens
+
+Tokens are checked against Google's published RS256 signing keys instead
+of a tokeninfo round-trip per sign-in. Keys are cached for as long as
+Google's Cache-Control allows and fetched through one long-lived client;
+if a refresh fails the previous keys keep being used.
+"""
+import asyncio
+import logging
+import re
+import time
+from typing import Optional, Protocol
+import httpx
+from fastapi import HTTPException, status
+from jose import jwt, JWTError
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+
+class KeySource(Protocol):
+    async def get_keys(self, refresh: bool = False) -> list[dict]:
+        """JWKS keys; refresh asks for a re-fetch (e.g. after a key rotation)"""
+        ...
+
+    async def aclose(self):
+        ...
+
+
+class StaticKeySource:
+    """Fixed key set, for tests and offline development"""
+
+    def __init__(self, jwks: dict):
+        self.keys = jwks["keys"]
+
+    async def get_keys(self, refresh: bool = False) -> list[dict]:
+        return self.keys
+
+    async def aclose(self):
+        pass
+
+
+class RemoteKeySource:
+    """Google's JWKS endpoint, cached in memory per Cache-Control max-age"""
+
+    DEFAULT_MAX_AGE = 3600  # seconds, when the response has no max-age
+    RETRY_AFTER_FAILURE = 30  # seconds before retrying a failed fetch
+    MIN_REFRESH_INTERVAL = 60  # seconds between refreshes forced by unknown kids
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL, client: Optional[httpx.AsyncClient] = None):
+        self.url = url
+        self._keys: list[dict] = []
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._client = client
+
+    async def get_keys(self, refresh: bool = False) -> list[dict]:
+        now = time.monotonic()
+        if refresh and now - self._fetched_at >= self.MIN_REFRESH_INTERVAL:
+            self._expires_at = 0.0
+        if now < self._expires_at:
+            return self._keys
+
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            if time.monotonic() >= self._expires_at:
+                await self._fetch()
+        return self._keys
+
+    async def _fetch(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=5.0)
+        try:
+            response = await self._client.get(self.url)
+            response.raise_for_status()
+            keys = response.json()["keys"]
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            logger.warning("Fetching Google signing keys failed: %s", e)
+            # Keep serving the keys we have; try again shortly
+            self._expires_at = time.monotonic() + self.RETRY_AFTER_FAILURE
+            return
+
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + self._max_age(response)
+
+    def _max_age(self, response: httpx.Response) -> int:
+        match = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else self.DEFAULT_MAX_AGE
+        age = response.headers.get("age", "0")
+        return max(max_age - (int(age) if age.isdigit() else 0), 0)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+key_source: KeySource = RemoteKeySource()
+
+
+def set_key_source(source: KeySource):
+    """Swap where signing keys come from (tests use a StaticKeySource)"""
+    global key_source
+    key_source = source
+
+
+def _invalid_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid Google token"
+    )
+
+
+def _find_key(keys: list[dict], kid: Optional[str]) -> Optional[dict]:
+    return next((key for key in keys if key.get("kid") == kid), None)
+
+
+async def verify_google_id_token(token: str) -> dict:
+    """Verify a Google ID token's signature and claims, returning the claims"""
+    if not settings.GOOGLE_CLIENT_ID:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Google sign-in is not configured"
+        )
+
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+    except JWTError:
+        raise _invalid_token()
+
+    keys = await key_source.get_keys()
+    if not keys:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Google sign-in is temporarily unavailable"
+        )
+
+    key = _find_key(keys, kid)
+    if key is None:
+        # Google rotates keys; an unknown kid may be a new one
+        key = _find_key(await key_source.get_keys(refresh=True), kid)
+    if key is None:
+        raise _invalid_token()
+
+    try:
+        return jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=settings.GOOGLE_CLIENT_ID,
+            issuer=GOOGLE_ISSUERS,
+            options={"verify_at_hash": False}
+        )
+    except JWTError:
+        raise _invalid_token()
@@ -0,0 +1,103 @@
+"""
+Conditional-request helpers (ETag / If-None-Match, Range)
+"""
+import hashlib
+import os
+from typing import BinaryIO, Optional
+import anyio
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def strong_etag(body: bytes) -> str:
+    """Strong validator for an exact response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """(first, last) byte offsets for a single-range Range header
+
+    None means send the whole representation (no header, one we don't
+    support, or a malformed one, which RFC 9110 says to ignore). Raises
+    ValueError for a range that lies entirely past the end.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    first, sep, last = spec.partition("-")
+    if not sep or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(range_header)
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = int(last) if last else size - 1
+    if first >= size:
+        raise ValueError(range_header)
+    if last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+async def _read_file(file: BinaryIO, first: int, last: int):
+    try:
+        file.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = await anyio.to_thread.run_sync(file.read, min(FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def file_response(request: Request, file: BinaryIO, etag: str, media_type: str,
+                  headers: dict) -> Response:
+    """Serve an open file with its ETag, honouring Range and If-Range"""
+    size = os.fstat(file.fileno()).st_size
+    headers = {**headers, "ETag": etag, "Accept-Ranges": "bytes"}
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            file.close()
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+
+    if byte_range is None:
+        first, last, status_code = 0, size - 1, 200
+    else:
+        first, last = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    headers["Content-Length"] = str(last - first + 1)
+    return StreamingResponse(
+        _read_file(file, first, last), status_code=status_code, media_type=media_type, headers=headers
+    )
@@ -0,0 +1,77 @@
+"""
+Benchmark POST /api/v1/logs against the configured database
+
+Counts the SQL statements each log creation sends and times the requests.
+Runs the app in-process, creates a throwaway user and deletes it afterwards.
+
+    python bench_create_log.py [requests]
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+import httpx
+from sqlalchemy import event, delete
+from app.main import app
+from app.database import async_engine, AsyncSessionLocal
+from app.models.user import User
+
+API = "/api/v1"
+
+
+async def main(requests: int):
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split(None, 1)[0].upper())
+
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    suffix = uuid.uuid4().hex[:8]
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(f"{API}/auth/register", json={
+            "username": f"bench{suffix}",
+            "email": f"bench{suffix}@example.com",
+            "password": "benchmark"
+        })
+        response.raise_for_status()
+        user_id = response.json()["user"]["id"]
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+        per_request = []
+        timings = []
+        try:
+            for i in range(requests):
+                statements.clear()
+                start = time.perf_counter()
+                response = await client.post(f"{API}/logs", headers=headers, json={
+                    "task_text": f"benchmark task {i}",
+                    "effort_level": "sapling"
+                })
+                timings.append(time.perf_counter() - start)
+                response.raise_for_status()
+                per_request.append(list(statements))
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", count_statement)
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+    await app.router.shutdown()
+
+    # The first statement of every request is the get_current_user lookup
+    # (never a cache hit: each create_log invalidates the cached user)
+    write_path = [len(s) - 1 for s in per_request]
+    print(f"Requests:              {requests}")
+    print(f"Statements per request: {per_request[-1]}")
+    print(f"create_log statements: max {max(write_path)}, mean {statistics.mean(write_path):.2f}")
+    print(f"Latency ms:            median {statistics.median(timings) * 1000:.2f}, "
+          f"max {max(timings) * 1000:.2f}")
+    print("✓ within budget" if max(write_path) <= 3 else "✗ over the 3-statement budget")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
@@ -0,0 +1,127 @@
+"""
+Benchmark GET /api/v1/export/* against the configured database
+
+Seeds a throwaway user with many logs, then streams an export and reports
+time to first byte, total time, bytes, the same for a repeat request
+(served from the export cache) and peak Python memory while generating
+(measured on a traced run with the cache off). Deletes the user afterwards.
+
+    python bench_export.py [logs] [path] [accept-encoding]
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+import uuid
+import httpx
+from sqlalchemy import delete, text
+from app.main import app
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.services.export_cache import export_cache
+
+API = "/api/v1"
+
+
+async def stream_export(path: str, headers: dict) -> tuple[float, float, int]:
+    """GET path through the app; returns (first byte s, total s, bytes)"""
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # The response listens for a disconnect while streaming
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal first_byte, size
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"export failed with {message['status']}")
+        if message["type"] == "http.response.body":
+            if message.get("body") and first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(message.get("body", b""))
+            if not message.get("more_body"):
+                response_done.set()
+
+    path, _, query = f"{API}{path}".partition("?")
+    await app({
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }, receive, send)
+    return first_byte, time.perf_counter() - start, size
+
+
+async def main(logs: int, path: str, accept_encoding: str):
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    suffix = uuid.uuid4().hex[:8]
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        response = await client.post(f"{API}/auth/register", json={
+            "username": f"bench{suffix}",
+            "email": f"bench{suffix}@example.com",
+            "password": "benchmark"
+        })
+        response.raise_for_status()
+        user_id = response.json()["user"]["id"]
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        if accept_encoding:
+            headers["Accept-Encoding"] = accept_encoding
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("""
+                INSERT INTO logs (id, user_id, task_text, effort_level, points_earned, tree_emoji, logged_at, date)
+                SELECT gen_random_uuid(), :user_id, 'benchmark task ' || n, 'sapling', 20, '🌿',
+                       now() - (n / 10) * interval '1 day', current_date - n / 10
+                FROM generate_series(1, :logs) AS n
+            """), {"user_id": user_id, "logs": logs})
+            await db.commit()
+
+        # Drive the ASGI app directly: httpx's ASGITransport buffers the
+        # whole body, which would hide time to first byte
+        first_byte, elapsed, size = await stream_export(path, headers)
+        cached_first_byte, cached_elapsed, _ = await stream_export(path, headers)
+
+        cache_max_bytes, export_cache.max_bytes = export_cache.max_bytes, 0
+        tracemalloc.start()
+        _, _, _ = await stream_export(path, headers)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        export_cache.max_bytes = cache_max_bytes
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+    await app.router.shutdown()
+
+    print(f"Export:            GET {path} for {logs} logs, Accept-Encoding: {accept_encoding or '-'}")
+    print(f"Time to first byte: {first_byte * 1000:.1f} ms")
+    print(f"Total:             {elapsed:.2f} s, {size / 1e6:.1f} MB")
+    print(f"Repeat (cached):   {cached_first_byte * 1000:.1f} ms to first byte, {cached_elapsed:.3f} s total")
+    print(f"Peak Python memory while generating: {peak / 1e6:.1f} MB (traced run, cache off)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200000,
+        sys.argv[2] if len(sys.argv) > 2 else "/export/csv",
+        sys.argv[3] if len(sys.argv) > 3 else ""
+    ))
@@ -0,0 +1,87 @@
+"""
+Benchmark a login storm against the configured database
+
+Fires concurrent POST /api/v1/auth/login requests while polling GET /health,
+then reports login throughput and the health endpoint's latency. With
+hashing on the event loop every health check waits behind a bcrypt call;
+with the hash pool its p99 should stay in the low milliseconds.
+
+    python bench_login.py [logins] [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+import httpx
+from sqlalchemy import delete
+from app.main import app
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.user import User
+
+API = "/api/v1"
+
+
+def percentile(samples: list[float], p: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+async def main(logins: int, concurrency: int):
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    suffix = uuid.uuid4().hex[:8]
+    credentials = {"email": f"bench{suffix}@example.com", "password": "benchmark"}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(f"{API}/auth/register", json={"username": f"bench{suffix}", **credentials})
+        response.raise_for_status()
+        user_id = response.json()["user"]["id"]
+
+        statuses: dict[int, int] = {}
+        remaining = logins
+        storm_over = asyncio.Event()
+
+        async def login_worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.post(f"{API}/auth/login", json=credentials)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        health_latencies = []
+
+        async def poll_health():
+            while not storm_over.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        poller = asyncio.create_task(poll_health())
+        start = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        storm_over.set()
+        await poller
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+    await app.router.shutdown()
+
+    print(f"bcrypt rounds:     {settings.BCRYPT_ROUNDS}, workers {settings.PASSWORD_HASH_WORKERS}, "
+          f"queue {settings.PASSWORD_HASH_MAX_QUEUE}")
+    print(f"Logins:            {logins} at concurrency {concurrency}, statuses {statuses}")
+    print(f"Login throughput:  {logins / elapsed:.1f}/s")
+    print(f"GET /health ms:    median {statistics.median(health_latencies) * 1000:.2f}, "
+          f"p99 {percentile(health_latencies, 0.99) * 1000:.2f}, "
+          f"max {max(health_latencies) * 1000:.2f} ({len(health_latencies)} samples)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    ))
@@ -0,0 +1,19 @@
+"""
+Shared test setup
+
+Database tests run against the PostgreSQL database in TEST_DATABASE_URL
+(its tables are dropped and recreated) and are skipped when it is unset.
+"""
+import os
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+# app.config reads these at import time
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql://localhost/unused"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("DB_SSLMODE", "prefer")
+
+requires_database = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
@@ -0,0 +1,25 @@
+"""
+Day-by-day streak replay, the reference for the vectorized recompute
+"""
+from datetime import date
+from app.services.game_logic import (
+    LOG_STREAK_TYPES,
+    new_streak_state,
+    update_daily_streak,
+    update_weekly_streak,
+    update_monthly_streak,
+    update_yearly_streak
+)
+
+
+def replay_streaks(days: list[date], bitmap: bytes, epoch: date) -> dict:
+    """Streak rows after logging on each of days (ascending) in turn, as
+    create_log leaves them"""
+    streaks = {streak_type: new_streak_state() for streak_type in LOG_STREAK_TYPES}
+    # Later days' bits don't change these rules' results for earlier days
+    for day in days:
+        update_daily_streak(streaks["daily"], bitmap, epoch, day)
+        update_weekly_streak(streaks["weekly"], bitmap, epoch, day)
+        update_monthly_streak(streaks["monthly"], bitmap, epoch, day)
+        update_yearly_streak(streaks["yearly"], bitmap, epoch, day)
+    return streaks
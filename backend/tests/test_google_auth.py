@@ -0,0 +1,153 @@
+"""
+Google ID-token verification against a local key set
+
+    pytest tests/test_google_auth.py
+"""
+import asyncio
+import time
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from jose import jwk, jwt
+from app.config import settings
+from app.utils import google_auth
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+
+def make_key(kid: str) -> tuple[str, dict]:
+    """Private PEM and the matching public JWK"""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, {**jwk.construct(public_pem, "RS256").to_dict(), "kid": kid, "use": "sig"}
+
+
+PRIVATE_PEM, PUBLIC_JWK = make_key("test-key")
+
+
+def make_token(kid: str = "test-key", private_pem: str = PRIVATE_PEM, **claims) -> str:
+    now = int(time.time())
+    return jwt.encode(
+        {
+            "iss": "https://accounts.google.com",
+            "aud": CLIENT_ID,
+            "sub": "1234567890",
+            "email": "someone@example.com",
+            "email_verified": True,
+            "iat": now,
+            "exp": now + 3600,
+            **claims
+        },
+        private_pem,
+        algorithm="RS256",
+        headers={"kid": kid}
+    )
+
+
+@pytest.fixture(autouse=True)
+def local_keys(monkeypatch):
+    monkeypatch.setattr(settings, "GOOGLE_CLIENT_ID", CLIENT_ID)
+    monkeypatch.setattr(google_auth, "key_source", google_auth.StaticKeySource({"keys": [PUBLIC_JWK]}))
+
+
+def verify(token: str) -> dict:
+    return asyncio.run(google_auth.verify_google_id_token(token))
+
+
+def assert_rejected(token: str, status_code: int = 401):
+    with pytest.raises(HTTPException) as error:
+        verify(token)
+    assert error.value.status_code == status_code
+
+
+def test_valid_token_returns_claims():
+    claims = verify(make_token())
+    assert claims["sub"] == "1234567890"
+    assert claims["email"] == "someone@example.com"
+
+
+def test_bare_issuer_is_accepted():
+    assert verify(make_token(iss="accounts.google.com"))["sub"] == "1234567890"
+
+
+def test_wrong_audience_is_rejected():
+    assert_rejected(make_token(aud="someone-else.apps.googleusercontent.com"))
+
+
+def test_wrong_issuer_is_rejected():
+    assert_rejected(make_token(iss="https://evil.example.com"))
+
+
+def test_expired_token_is_rejected():
+    assert_rejected(make_token(exp=int(time.time()) - 60))
+
+
+def test_unknown_key_is_rejected():
+    assert_rejected(make_token(kid="other-key"))
+
+
+def test_forged_signature_is_rejected():
+    other_pem, _ = make_key("test-key")
+    assert_rejected(make_token(private_pem=other_pem))
+
+
+def test_garbage_is_rejected():
+    assert_rejected("not-a-jwt")
+
+
+def test_unconfigured_client_id_is_unavailable(monkeypatch):
+    monkeypatch.setattr(settings, "GOOGLE_CLIENT_ID", "")
+    assert_rejected(make_token(), status_code=503)
+
+
+def test_remote_keys_are_cached_for_max_age():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(
+            200,
+            json={"keys": [PUBLIC_JWK]},
+            headers={"Cache-Control": "public, max-age=100", "Age": "40"}
+        )
+
+    async def run():
+        source = google_auth.RemoteKeySource(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        assert await source.get_keys() == [PUBLIC_JWK]
+        assert await source.get_keys() == [PUBLIC_JWK]
+        remaining = source._expires_at - time.monotonic()
+        await source.aclose()
+        return remaining
+
+    remaining = asyncio.run(run())
+    assert len(requests) == 1
+    assert 55 < remaining <= 60
+
+
+def test_remote_keys_survive_a_failed_refresh():
+    responses = [
+        httpx.Response(200, json={"keys": [PUBLIC_JWK]}, headers={"Cache-Control": "max-age=0"}),
+        httpx.Response(503),
+    ]
+
+    async def run():
+        source = google_auth.RemoteKeySource(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(lambda request: responses.pop(0)))
+        )
+        first = await source.get_keys()
+        second = await source.get_keys()
+        await source.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == [PUBLIC_JWK]
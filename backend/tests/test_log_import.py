@@ -0,0 +1,107 @@
+"""
+Parsing and validation for POST /logs/import
+
+    pytest tests/test_log_import.py
+"""
+import asyncio
+import gzip
+import json
+import uuid
+from datetime import date, datetime, timezone
+import pytest
+from app.services import log_import
+
+USER_ID = uuid.uuid4()
+TODAY = date(2026, 10, 18)  # a Sunday
+NOW = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+
+
+def parse(format: str, body: bytes, gzipped: bool = False, chunk_size: int = 7) -> list[dict]:
+    """Records parsed from body, delivered in small chunks"""
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    async def collect():
+        return [record async for record in log_import.PARSERS[format](log_import._text(chunks(), gzipped))]
+
+    return asyncio.run(collect())
+
+
+def test_csv_export_round_trip():
+    body = (
+        "Date,Day,Task,Effort,Points,Tree\r\n"
+        '2026-10-17,Saturday,"multi\nline, ""quoted"" task",Oak,100,🌳\r\n'
+        "2026-10-16,Friday,plain task,Seed,5,🌲\r\n"
+    ).encode()
+    records = parse("csv", body)
+    assert [record["task"] for record in records] == ['multi\nline, "quoted" task', "plain task"]
+
+    row = log_import.log_row(records[0], USER_ID, TODAY, NOW)
+    assert row[1:6] == (USER_ID, 'multi\nline, "quoted" task', "oak", 100, "🌳")
+    assert row[7] == date(2026, 10, 17)
+
+
+def test_csv_header_must_name_required_columns():
+    with pytest.raises(log_import.ImportFormatError, match="effort"):
+        parse("csv", b"Date,Task\n2026-10-17,some task\n")
+
+
+def test_json_export_logs_array():
+    export = {
+        "user": {"username": "alice"},
+        "milestones": [],
+        "logs": [
+            {"date": "2026-10-17", "task": "first task", "effort": "seed", "points": 10, "tree": "🌲",
+             "logged_at": "2026-10-17T09:00:00+00:00"},
+            {"date": "2026-10-16", "task": "second task", "effort": "oak", "points": 60, "tree": "🌳",
+             "logged_at": "2026-10-16T09:00:00+00:00"},
+        ],
+    }
+    body = json.dumps(export, indent=2, ensure_ascii=False).encode()
+    assert [record["task"] for record in parse("json", body)] == ["first task", "second task"]
+
+
+def test_json_truncated_array_is_rejected():
+    body = b'{"logs": [{"date": "2026-10-17", "task": "first task", "effort": "seed"}, {"date": '
+    with pytest.raises(log_import.ImportFormatError):
+        parse("json", body)
+
+
+def test_gzipped_ndjson_skips_header_line():
+    lines = [
+        {"type": "export", "user": {"username": "alice"}},
+        {"type": "log", "date": "2026-10-17", "task": "first task", "effort": "sapling", "points": 20},
+    ]
+    body = gzip.compress("".join(json.dumps(line) + "\n" for line in lines).encode())
+    assert [record["task"] for record in parse("ndjson", body, gzipped=True)] == ["first task"]
+
+
+@pytest.mark.parametrize("record, message", [
+    ({"date": "2026-10-17", "task": "ok task", "effort": "huge"}, "effort_level"),
+    ({"date": "2026-10-17", "task": "ok", "effort": "seed"}, "task_text"),
+    ({"date": "2026-10-19", "task": "ok task", "effort": "seed"}, "future"),
+    ({"date": "2026-10-17", "task": "ok task", "effort": "seed", "points": 500}, "between 5 and 15"),
+    ({"date": "yesterday", "task": "ok task", "effort": "seed"}, "isoformat"),
+    ({"date": "2026-10-18", "task": "ok task", "effort": "seed", "logged_at": "2026-10-18T13:00:00+00:00"}, "future"),
+    ({"date": "2026-10-17", "task": "ok task", "effort": "seed", "logged_at": "2026-10-15T12:00:00+00:00"}, "a day from"),
+])
+def test_invalid_records(record, message):
+    with pytest.raises(ValueError, match=message):
+        log_import.log_row(record, USER_ID, TODAY, NOW)
+
+
+@pytest.mark.parametrize("logged_at", [
+    "2026-10-16T22:00:00-05:00",  # an evening log on a UTC-5 server, exported in local time
+    "2026-10-17T03:00:00+00:00",  # the same log exported in UTC
+])
+def test_logged_at_near_date_is_accepted(logged_at):
+    record = {"date": "2026-10-16", "task": "ok task", "effort": "seed", "logged_at": logged_at}
+    row = log_import.log_row(record, USER_ID, TODAY, NOW)
+    assert row[6] == datetime(2026, 10, 17, 3, tzinfo=timezone.utc)
+
+
+def test_missing_points_are_rolled_for_the_effort():
+    row = log_import.log_row({"date": "2026-10-17", "task": "ok task", "effort": "Sapling"}, USER_ID, TODAY, NOW)
+    assert row[3] == "sapling" and 20 <= row[4] <= 50
+
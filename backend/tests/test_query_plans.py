@@ -0,0 +1,168 @@
+"""
+Query-plan regression suite
+
+Drives every hot route through the app against a seeded database, captures
+the SQL each one sends, and EXPLAINs it with sequential scans disabled. A
+Seq Scan that survives enable_seqscan = off means no index can serve that
+query, so the test fails and names the statement.
+
+    TEST_DATABASE_URL=postgresql://... pytest tests/test_query_plans.py
+"""
+import asyncio
+import json
+import httpx
+import pytest
+from sqlalchemy import event, text
+from tests.conftest import requires_database
+
+pytestmark = requires_database
+
+API = "/api/v1"
+SEED_USERS = 200
+SEED_LOGS_PER_USER = 100
+
+
+def seed(conn):
+    """Bulk rows so the planner sees realistic table sizes"""
+    conn.execute(text("""
+        INSERT INTO users (id, username, email, is_public, total_points, current_level)
+        SELECT gen_random_uuid(), 'seed' || i, 'seed' || i || '@example.com', i % 2 = 0, i * 10, 1
+        FROM generate_series(1, :users) AS i
+    """), {"users": SEED_USERS})
+    conn.execute(text("""
+        INSERT INTO logs (id, user_id, task_text, effort_level, points_earned, tree_emoji, logged_at, date)
+        SELECT gen_random_uuid(), u.id, 'seeded task ' || n, 'seed', 10, '🌲',
+               now() - n * interval '1 day', current_date - n
+        FROM users u, generate_series(1, :logs) AS n
+    """), {"logs": SEED_LOGS_PER_USER})
+    conn.execute(text("""
+        INSERT INTO daily_activity (user_id, date, points, log_count, seed_count, sapling_count, oak_count)
+        SELECT user_id, date, sum(points_earned), count(*), count(*), 0, 0 FROM logs GROUP BY user_id, date
+    """))
+    conn.execute(text("""
+        INSERT INTO streaks (id, user_id, streak_type, current_count, best_count, streak_metadata)
+        SELECT gen_random_uuid(), u.id, t, 1, 1, '{}'::jsonb
+        FROM users u, unnest(ARRAY['daily', 'weekly', 'monthly', 'yearly']) AS t
+    """))
+    conn.execute(text("""
+        INSERT INTO milestones (id, user_id, badge_name, badge_type)
+        SELECT gen_random_uuid(), id, '3-Day Starter', 'streak' FROM users
+    """))
+    conn.execute(text("""
+        INSERT INTO shared_forests (id, user_id, share_token, share_type, is_active, view_count)
+        SELECT gen_random_uuid(), id, substr(md5(id::text), 1, 8), 'profile', true, 0 FROM users
+    """))
+
+
+async def exercise_routes(app, capture):
+    """Call each hot route (and background job) once, recording the
+    statements per route"""
+    from app.services.streak_expiry import expire_streaks
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post(f"{API}/auth/register", json={
+            "username": "planner", "email": "planner@example.com", "password": "planner"
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await client.patch(f"{API}/auth/me", headers=headers, json={"is_public": True})
+
+        async def call(name, method, path, **kwargs):
+            capture["route"] = name
+            response = await client.request(method, f"{API}{path}", headers=headers, **kwargs)
+            capture["route"] = None
+            assert response.status_code < 400, (name, response.text)
+            return response
+
+        await call("POST /auth/login", "POST", "/auth/login",
+                   json={"email": "planner@example.com", "password": "planner"})
+        await call("GET /auth/me", "GET", "/auth/me")
+        sync = (await call("GET /logs/changes", "GET", "/logs/changes")).json()
+        log = (await call("POST /logs", "POST", "/logs",
+                          json={"task_text": "plan me", "effort_level": "oak"})).json()["log"]
+        page = await call("GET /logs", "GET", "/logs", params={"limit": 1})
+        await call("GET /logs?cursor", "GET", "/logs", params={"cursor": page.headers["X-Next-Cursor"]})
+        await call("GET /logs/today", "GET", "/logs/today")
+        await call("GET /logs/week", "GET", "/logs/week")
+        await call("GET /logs/heatmap", "GET", "/logs/heatmap")
+        await call("GET /logs/heatmap?bucket=month", "GET", "/logs/heatmap", params={"bucket": "month", "days": 1000})
+        await call("GET /streaks", "GET", "/streaks")
+        await call("GET /streaks/milestones", "GET", "/streaks/milestones")
+        await call("GET /streaks/leaderboard", "GET", "/streaks/leaderboard")
+        share = (await call("POST /share", "POST", "/share", json={"share_type": "profile"})).json()
+        await call("GET /share", "GET", "/share")
+        await call("GET /share/{token}", "GET", f"/share/{share['share_token']}")
+        await call("POST /share/{token}/like", "POST", f"/share/{share['share_token']}/like")
+        await call("GET /export/csv", "GET", "/export/csv")
+        await call("GET /export/json", "GET", "/export/json")
+        await call("DELETE /logs/{id}", "DELETE", f"/logs/{log['id']}")
+        await call("GET /logs/changes?since", "GET", "/logs/changes", params={"since": sync["token"]})
+        await call("DELETE /share/{token}", "DELETE", f"/share/{share['share_token']}")
+
+        capture["route"] = "streak expiry job"
+        await expire_streaks()
+        capture["route"] = None
+
+
+@pytest.fixture(scope="module")
+def captured_statements():
+    from app.main import app
+    from app.database import Base, engine, async_engine
+    from app import models  # noqa: F401
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        seed(conn)
+        conn.execute(text("ANALYZE"))
+
+    capture = {"route": None, "statements": []}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if capture["route"] and not executemany:
+            capture["statements"].append((capture["route"], statement, parameters))
+
+    async def run():
+        await app.router.startup()
+        event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            await exercise_routes(app, capture)
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+            await app.router.shutdown()
+            await async_engine.dispose()
+
+    asyncio.run(run())
+    return capture["statements"]
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Relations read by a Seq Scan anywhere in the plan tree"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def test_routes_were_captured(captured_statements):
+    assert len({route for route, _, _ in captured_statements}) >= 15
+
+
+def test_no_hot_query_falls_back_to_seq_scan(captured_statements):
+    from app.database import engine
+
+    failures = []
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        for route, statement, parameters in captured_statements:
+            result = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters or {})
+            plan = result.scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            tables = seq_scans(plan[0]["Plan"])
+            if tables:
+                failures.append(f"{route}: Seq Scan on {', '.join(tables)}\n    {statement}")
+        conn.rollback()
+
+    assert not failures, "Queries without a usable index:\n" + "\n".join(failures)
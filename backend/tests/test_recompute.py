@@ -0,0 +1,92 @@
+"""
+The vectorized recompute against the day-by-day streak replay it replaces
+
+    pytest tests/test_recompute.py
+"""
+import random
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from app.services import activity
+from app.services.game_logic import expire_broken_streaks
+from app.services.recompute import compute_streaks, compute_user_values
+from tests.streak_replay import replay_streaks
+
+TODAY = date(2026, 10, 18)  # a Sunday
+
+
+def random_history(rng: random.Random) -> list[date]:
+    """Sorted active days: dense stretches, gaps, and the odd lone day"""
+    day = TODAY - timedelta(days=rng.randint(0, 1500))
+    days = []
+    while day <= TODAY:
+        if rng.random() < 0.8:
+            days.append(day)
+        day += timedelta(days=1 if rng.random() < 0.9 else rng.randint(2, 60))
+    return days
+
+
+def test_replay_streaks():
+    # The last 12 days, then a gap, then 40 days straight
+    days = sorted(TODAY - timedelta(days=n) for n in [*range(0, 12), *range(20, 60)])
+    epoch = days[0]
+    streaks = replay_streaks(days, activity.from_days(epoch, days), epoch)
+
+    daily, weekly, monthly = streaks["daily"], streaks["weekly"], streaks["monthly"]
+    assert (daily["current_count"], daily["best_count"], daily["started_at"]) == (12, 40, date(2026, 10, 7))
+    # Both of the last two weeks have 5+ active days; the week before has one
+    assert (weekly["current_count"], weekly["best_count"], weekly["started_at"]) == (2, 5, date(2026, 10, 5))
+    assert (monthly["current_count"], monthly["started_at"]) == (3, date(2026, 8, 20))
+    assert all(streak["last_updated"] == TODAY for streak in streaks.values())
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_streaks_match_replay(seed):
+    days = random_history(random.Random(seed))
+    epoch = days[0] if days else TODAY
+    expected = replay_streaks(days, activity.from_days(epoch, days), epoch)
+    streaks = compute_streaks(np.array(days, dtype="datetime64[D]"))
+
+    for streak_type, state in expected.items():
+        assert {**streaks[streak_type], "id": None} == {**state, "id": None}, streak_type
+
+
+def test_broken_streaks_expire():
+    days = [date(2026, 9, 28) + timedelta(days=n) for n in range(12)]  # to Friday 2026-10-09
+    streaks = compute_streaks(np.array(days, dtype="datetime64[D]"))
+
+    # Last week counted and this month is active; the daily run is over
+    expired = expire_broken_streaks(compute_streaks(np.array(days, dtype="datetime64[D]")), TODAY)
+    assert {streak_type: streak["current_count"] for streak_type, streak in expired.items()} == {
+        "daily": 0, "weekly": 2, "monthly": 2, "yearly": 1
+    }
+    assert expired["daily"]["best_count"] == streaks["daily"]["best_count"] == 12
+
+    # A week later, last week had no logs either
+    expired = expire_broken_streaks(streaks, TODAY + timedelta(days=7))
+    assert expired["weekly"]["current_count"] == 0 and expired["monthly"]["current_count"] == 2
+
+
+def test_no_activity():
+    streaks = compute_streaks(np.array([], dtype="datetime64[D]"))
+    assert all(streak["current_count"] == streak["best_count"] == 0 for streak in streaks.values())
+
+    values = compute_user_values(
+        np.array([], dtype="datetime64[D]"), np.array([], dtype=np.int64), TODAY, TODAY
+    )
+    assert (values["total_points"], values["current_level"], values["activity_bitmap"]) == (0, 1, b"")
+
+
+def test_user_values():
+    days = [date(2026, 9, 29), date(2026, 10, 1), date(2026, 10, 12), date(2026, 10, 18)]
+    points = [100, 200, 300, 400]
+    # The stored epoch is later than the first log, so it moves back
+    values = compute_user_values(
+        np.array(days, dtype="datetime64[D]"), np.array(points, dtype=np.int64), date(2026, 10, 1), TODAY
+    )
+
+    assert values["activity_epoch"] == date(2026, 9, 29)
+    assert values["activity_bitmap"] == activity.from_days(date(2026, 9, 29), days)
+    assert (values["total_points"], values["current_level"], values["last_log_date"]) == (1000, 3, TODAY)
+    assert (values["week_start"], values["week_points"]) == (date(2026, 10, 12), 700)
+    assert (values["month_start"], values["month_points"]) == (date(2026, 10, 1), 900)